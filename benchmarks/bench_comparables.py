@@ -0,0 +1,69 @@
+# Comparable-sales store: bulk import and nearest-N query latency.
+#
+#   python benchmarks/bench_comparables.py --rows 1000000 --queries 200
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from propiq.comparables import CSV_COLUMNS, ComparablesStore  # noqa: E402
+
+TYPES = ("Land", "House", "Apartment", "Commercial")
+
+
+def write_sales_csv(path, rows, seed=1):
+    # random transactions spread over Sri Lanka, denser around Colombo
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for i in range(rows):
+            if rng.random() < 0.6:
+                lat, lon = rng.gauss(6.90, 0.08), rng.gauss(79.90, 0.08)
+            else:
+                lat, lon = rng.uniform(5.9, 9.8), rng.uniform(79.7, 81.9)
+            writer.writerow((
+                f"{lat:.6f}", f"{lon:.6f}", rng.choice(TYPES), round(rng.uniform(5, 80), 1),
+                (start + timedelta(days=rng.randrange(4000))).isoformat(),
+                round(rng.uniform(2e6, 2e8), -3), f"Location {i % 5000}",
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "sales.csv")
+        write_sales_csv(csv_path, args.rows)
+        store = ComparablesStore(os.path.join(tmp, "comparables.sqlite3"))
+        start = time.perf_counter()
+        store.import_csv(csv_path)
+        print(f"imported {args.rows} rows in {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(2)
+        today = date(2026, 1, 1)
+        timings, found = [], 0
+        for _ in range(args.queries):
+            lat, lon = rng.gauss(6.90, 0.08), rng.gauss(79.90, 0.08)
+            start = time.perf_counter()
+            rows = store.nearest(lat, lon, radius_km=2, limit=10, property_type="Land", months=24, today=today)
+            timings.append(time.perf_counter() - start)
+            found += len(rows)
+        timings.sort()
+        print(f"nearest 10 Land within 2 km / 24 months: p50 {statistics.median(timings) * 1e3:.2f} ms, "
+              f"p95 {timings[int(len(timings) * 0.95) - 1] * 1e3:.2f} ms, avg {found / args.queries:.1f} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+# Multi-user load test: N virtual valuers driving the real app with AppTest.
+#
+#   python benchmarks/bench_load.py --users 8
+#   python benchmarks/bench_load.py --users 16 --processes 4 --rounds 2 --out load.json
+#   PROPIQ_USER_STORE=json python benchmarks/bench_load.py --users 8   # legacy users.json
+#
+# Every session registers through the UI, logs in, fills the form fields
+# (one rerun per field, like tabbing through the form), ticks property parts,
+# uploads photos, presses Generate and polls until the download button shows
+# up, then logs out. All processes share one scratch data directory, so the
+# user store, image cache and upload directories see the same contention as
+# a real server.
+#
+# AppTest swaps in a process-wide mock runtime for each script run, so runs
+# inside one process are serialised behind a lock: the reported rerun latency
+# includes the time spent waiting for other sessions' runs (queueing), which
+# is what a valuer waits for on a single-process server. Report jobs still run
+# on the app's own JobQueue threads. Use --processes to spread users over
+# several interpreters (like several server replicas on one data directory).
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "value app final.py")
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import SENTENCE, photo  # noqa: E402
+
+TEXT_INPUTS = ("a) ", "b) ", "e) ")
+TEXT_AREAS = ("c) ", "d) ", "g) ", "h) ", "j) ", "k) ")
+PARTS = ("Living Room", "Bedroom", "Dining Room", "Open Veranda")
+# exception text that points at two sessions fighting over the same file
+COLLISION_MARKERS = ("database is locked", "No such file", "FileNotFoundError", "PermissionError",
+                     "JSONDecodeError", "Expecting value", "being used by another process")
+
+RUN_LOCK = threading.Lock()
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values):
+    if not values:
+        return {"n": 0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3  # noqa: E731
+    return {"n": len(ordered), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "max_ms": ordered[-1] * 1e3}
+
+
+class Session:
+    def __init__(self, name, images, poll, timeout, stats):
+        from streamlit.testing.v1 import AppTest
+
+        self.name = name
+        self.images = images
+        self.poll = poll
+        self.timeout = timeout
+        self.stats = stats
+        self.at = AppTest.from_file(APP, default_timeout=120)
+
+    # --- helpers ---
+    def run(self, step, widget=None):
+        queued = time.perf_counter()
+        with RUN_LOCK:
+            started = time.perf_counter()
+            (widget or self.at).run()
+        finished = time.perf_counter()
+        self.stats.latency(step, finished - queued, finished - started)
+        if self.at.exception:
+            raise RuntimeError(f"{step}: {self.at.exception[0].message}")
+
+    def button(self, label):
+        for b in self.at.button:
+            if b.label == label or label in b.label:
+                return b
+        raise LookupError(f"no button {label!r}")
+
+    def widget(self, widgets, prefix):
+        return next(w for w in widgets if w.label.startswith(prefix))
+
+    # --- the scripted session ---
+    def register_and_login(self, password="load-test"):
+        self.run("open")
+        self.run("register_page", self.button("Register as a new member").click())
+        self.at.text_input(key="reg_username").input(self.name)
+        self.at.text_input(key="reg_password").input(password)
+        self.at.text_input(key="reg_confirm_password").input(password)
+        self.run("register", self.button("Register").click())
+        self.at.text_input(key="login_username").input(self.name)
+        self.at.text_input(key="login_password").input(password)
+        self.run("login", self.button("Login").click())
+        if not self.at.session_state["logged_in"]:
+            errors = [e.value for e in self.at.error]
+            raise RuntimeError(f"login failed after registering: {errors}")
+
+    def fill_fields(self):
+        text = f"{self.name}: {SENTENCE * 3}"
+        for prefix in TEXT_INPUTS:
+            self.widget(self.at.text_input, prefix).input(f"{self.name} {prefix}")
+            self.run("field")
+        for prefix in TEXT_AREAS:
+            self.widget(self.at.text_area, prefix).input(text)
+            self.run("field")
+        for part in PARTS[:max(self.images - 1, 0)]:
+            self.widget(self.at.checkbox, part).check()
+            self.run("field")
+
+    def upload_photos(self):
+        uploaded = {}
+        seed = abs(hash(self.name)) % 10_000
+        keys = ["main_img"] + [f"img_{i}" for i in range(1, self.images)]
+        for n, key in enumerate(keys):
+            data = photo(1600, 1200, seed=seed + n)
+            self.at.file_uploader(key=key).set_value((f"{key}.jpg", data, "image/jpeg"))
+            self.run("upload")
+            uploaded[key] = data
+        self.check_uploads(uploaded)
+        return uploaded
+
+    def check_uploads(self, uploaded):
+        # each slot must hold this session's own processed image, inside
+        # this session's directory
+        from propiq.images import content_hash
+
+        store = self.at.session_state["uploads"]
+        entries = store._entries
+        for slot, data in uploaded.items():
+            entry = entries.get(slot)
+            if entry is None:
+                raise FileNotFoundError(f"upload slot {slot} missing")
+            if not entry["path"].startswith(store.dir) or not os.path.exists(entry["path"]):
+                raise FileNotFoundError(f"upload {slot} not in session directory: {entry['path']}")
+            if entry["hash"] != content_hash(data):
+                raise RuntimeError(f"collision: upload {slot} holds another image")
+
+    def generate(self):
+        start = time.perf_counter()
+        self.run("generate", self.button("Generate PDF Report").click())
+        deadline = start + self.timeout
+        while time.perf_counter() < deadline:
+            if self.at.get("download_button"):
+                self.stats.report(time.perf_counter() - start)
+                return
+            if self.at.error:
+                raise RuntimeError(self.at.error[0].value)
+            time.sleep(self.poll)
+            self.run("poll")
+        raise TimeoutError(f"no report after {self.timeout:.0f} s")
+
+    def logout(self):
+        self.run("logout", self.button("Logout").click())
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.service = []
+        self.reports = []
+        self.sessions = 0
+        self.errors = {"collision": [], "error": []}
+
+    def latency(self, step, seconds, service):
+        with self._lock:
+            self.latencies.setdefault(step, []).append(seconds)
+            self.service.append(service)
+
+    def report(self, seconds):
+        with self._lock:
+            self.reports.append(seconds)
+
+    def error(self, name, exc):
+        message = f"{name}: {type(exc).__name__}: {exc}"
+        kind = "collision" if any(m in message for m in COLLISION_MARKERS) or "collision" in message else "error"
+        with self._lock:
+            self.errors[kind].append(message[:300])
+
+
+def virtual_user(index, args, stats):
+    time.sleep(random.uniform(0, args.ramp))
+    for round_ in range(args.rounds):
+        name = f"load-{args.tag}-{index}-{round_}"
+        try:
+            session = Session(name, args.images, args.poll, args.timeout, stats)
+            session.register_and_login()
+            session.fill_fields()
+            uploaded = session.upload_photos() if args.images else {}
+            session.generate()
+            # a finished report must not have cost this session its files
+            session.check_uploads(uploaded)
+            session.logout()
+        except Exception as e:
+            stats.error(name, e)
+        finally:
+            session = None
+            with stats._lock:
+                stats.sessions += 1
+
+
+def child(args):
+    os.chdir(ROOT)
+    # import everything and build the shared resources before the baseline
+    from streamlit.testing.v1 import AppTest
+    from propiq import report
+
+    report.load_resources()
+    with RUN_LOCK:
+        AppTest.from_file(APP, default_timeout=120).run()
+    gc.collect()
+    baseline = rss_mb()
+
+    stats = Stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for i in range(args.users):
+            pool.submit(virtual_user, i, args, stats)
+    wall = time.perf_counter() - start
+    gc.collect()
+    end = rss_mb()
+    return {
+        "wall_seconds": wall,
+        "latencies": stats.latencies,
+        "service": stats.service,
+        "reports": stats.reports,
+        "sessions": stats.sessions,
+        "errors": stats.errors,
+        "rss_baseline_mb": baseline,
+        "rss_end_mb": end,
+        "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def summarize(results):
+    latencies, service, reports, errors = {}, [], [], {"collision": [], "error": []}
+    for r in results:
+        for step, values in r["latencies"].items():
+            latencies.setdefault(step, []).extend(values)
+        service += r["service"]
+        reports += r["reports"]
+        for kind in errors:
+            errors[kind] += r["errors"][kind]
+    wall = max(r["wall_seconds"] for r in results)
+    sessions = sum(r["sessions"] for r in results)
+    all_runs = [v for values in latencies.values() for v in values]
+    return {
+        "sessions": sessions,
+        "wall_seconds": wall,
+        "reports": len(reports),
+        "reports_per_minute": len(reports) / wall * 60 if wall else 0.0,
+        "time_to_report": percentiles(reports),
+        "rerun": percentiles(all_runs),
+        "rerun_service": percentiles(service),
+        "steps": {step: percentiles(values) for step, values in sorted(latencies.items())},
+        "memory_per_session_mb": sum(r["rss_end_mb"] - r["rss_baseline_mb"] for r in results) / max(sessions, 1),
+        "rss_peak_mb": max(r["rss_peak_mb"] for r in results),
+        "collision_errors": len(errors["collision"]),
+        "other_errors": len(errors["error"]),
+        "error_samples": (errors["collision"] + errors["error"])[:10],
+    }
+
+
+def print_summary(s, args):
+    print(f"{args.users} user(s) x {args.rounds} round(s) on {args.processes} process(es): "
+          f"{s['sessions']} sessions in {s['wall_seconds']:.1f} s")
+    print(f"reports:   {s['reports']} ({s['reports_per_minute']:.1f}/min), time to report "
+          f"p50 {s['time_to_report'].get('p50_ms', 0) / 1e3:.2f} s, p95 {s['time_to_report'].get('p95_ms', 0) / 1e3:.2f} s")
+    print(f"reruns:    p50 {s['rerun'].get('p50_ms', 0):.0f} ms, p95 {s['rerun'].get('p95_ms', 0):.0f} ms, "
+          f"p99 {s['rerun'].get('p99_ms', 0):.0f} ms (script time alone p50 {s['rerun_service'].get('p50_ms', 0):.0f} ms)")
+    for step, p in s["steps"].items():
+        print(f"  {step:<14} n={p['n']:<5} p50 {p['p50_ms']:8.0f} ms  p95 {p['p95_ms']:8.0f} ms")
+    print(f"memory:    {s['memory_per_session_mb']:+.2f} MB retained per session, peak RSS {s['rss_peak_mb']:.0f} MB")
+    print(f"errors:    {s['collision_errors']} shared-file collision(s), {s['other_errors']} other")
+    for sample in s["error_samples"]:
+        print(f"  {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users (total)")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--rounds", type=int, default=1, help="sessions per virtual user")
+    parser.add_argument("--images", type=int, default=2, help="photos per session (main + parts)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="spread session starts over this many seconds")
+    parser.add_argument("--poll", type=float, default=0.5, help="seconds between reruns while a report builds")
+    parser.add_argument("--timeout", type=float, default=300.0, help="give up on a report after this long")
+    parser.add_argument("--data-dir", help="PROPIQ_DATA_DIR to load (default: a fresh scratch directory)")
+    parser.add_argument("--out", help="write the summary as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--tag", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.images = min(args.images, len(PARTS) + 1)
+
+    if args.child:
+        print(json.dumps(child(args)))
+        return 0
+
+    scratch = None if args.data_dir else tempfile.mkdtemp(prefix="propiq-load-")
+    data_dir = os.path.abspath(args.data_dir or scratch)
+    env = dict(os.environ, PROPIQ_DATA_DIR=data_dir,
+               PROPIQ_USERS_FILE=os.path.join(data_dir, "users.json"))
+    try:
+        procs = []
+        for p in range(args.processes):
+            users = args.users // args.processes + (1 if p < args.users % args.processes else 0)
+            if not users:
+                continue
+            cmd = [sys.executable, __file__, "--child", "--users", str(users), "--rounds", str(args.rounds),
+                   "--images", str(args.images), "--ramp", str(args.ramp), "--poll", str(args.poll),
+                   "--timeout", str(args.timeout), "--tag", f"{os.getpid()}-{p}"]
+            procs.append(subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+        results = []
+        for proc in procs:
+            out, err = proc.communicate()
+            if proc.returncode:
+                sys.stderr.write(err)
+                raise SystemExit(f"load process failed with exit code {proc.returncode}")
+            results.append(json.loads(out.strip().splitlines()[-1]))
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    summary = summarize(results)
+    print_summary(summary, args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(dict(summary, args={k: v for k, v in vars(args).items() if k not in ("child", "tag")}), f, indent=2)
+    return 1 if summary["collision_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# Payload sent to the browser: base64 PDF iframe vs the HTML quick preview.
+#
+#   python benchmarks/bench_preview.py --images 0 5 10
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import photo, report_fields  # noqa: E402
+from propiq import config  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, nargs="+", default=[0, 5, 10])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.IMAGE_CACHE_DIR = tmp
+        from propiq.images import ingest_image
+        from propiq.preview import render_preview_html, thumbnail
+        from propiq.report import generate_pdf
+
+        photos = [ingest_image(photo(4000, 3000, seed=i))["path"] for i in range(max(args.images))]
+        print(f"{'images':>6} {'pdf iframe':>12} {'html preview':>13} {'+thumbnails':>12} {'pdf ms':>8} {'html ms':>8}")
+        for n in args.images:
+            fields = report_fields("typical", photos[:n])
+            start = time.perf_counter()
+            _, pdf_bytes = generate_pdf(fields, dest="S", cache=None)
+            iframe = f'<iframe src="data:application/pdf;base64,{base64.b64encode(pdf_bytes).decode()}"></iframe>'
+            pdf_ms = (time.perf_counter() - start) * 1e3
+            start = time.perf_counter()
+            preview = render_preview_html(fields)
+            html_ms = (time.perf_counter() - start) * 1e3
+            thumbs = sum(os.path.getsize(thumbnail(p)) for p in photos[:n])
+            print(f"{n:>6} {len(iframe) / 1024:>10.0f}KB {len(preview) / 1024:>11.1f}KB "
+                  f"{(len(preview) + thumbs) / 1024:>10.0f}KB {pdf_ms:>8.1f} {html_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# Report engine benchmark suite: wall time, peak memory and output size.
+#
+#   python benchmarks/bench_report.py --out bench.json
+#   python benchmarks/bench_report.py --baseline bench.json --threshold 0.25
+#
+# Every case runs offline on synthetic inputs (benchmarks/fixtures.py) with
+# the fragment cache disabled. With --baseline the run fails (exit 1) when a
+# case is slower, uses more memory or produces a bigger PDF than the
+# baseline by more than --threshold (time differences under --min-time-ms
+# are treated as noise).
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import SENTENCE, photo, report_fields  # noqa: E402
+
+RESOLUTIONS = {"1024x768": (1024, 768), "1920x1440": (1920, 1440), "4000x3000": (4000, 3000)}
+METRICS = ("seconds", "peak_bytes", "output_bytes")
+
+
+def build_cases(photo_dir):
+    # name -> zero-argument callable returning the PDF bytes
+    from propiq.report import add_template_paragraph, generate_pdf, pdf_class
+
+    def report(fields):
+        return lambda: generate_pdf(fields, dest="S", report_id="PROPIQ-BENCH", cache=None)[1]
+
+    photos = {}
+    for label, (w, h) in RESOLUTIONS.items():
+        photos[label] = []
+        for i in range(20):
+            path = os.path.join(photo_dir, f"{label}-{i}.jpg")
+            with open(path, "wb") as f:
+                f.write(photo(w, h, seed=i))
+            photos[label].append(path)
+
+    cases = {f"text-{text}": report(report_fields(text)) for text in ("empty", "typical", "maximal")}
+    for label in RESOLUTIONS:
+        for count in (5, 20):
+            cases[f"images-{count}x{label}"] = report(report_fields("typical", photos[label][:count]))
+
+    def long_paragraph():
+        pdf = pdf_class()()
+        pdf.add_page()
+        text = "\n\n".join([SENTENCE * 40] * 25)
+        add_template_paragraph(pdf, text, text)
+        out = pdf.output(dest="S")
+        return out.encode("latin-1") if isinstance(out, str) else bytes(out)
+
+    cases["paragraph-long"] = long_paragraph
+    return cases
+
+
+def run_case(fn, repeats):
+    fn()  # warm up imports and parsers
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    output = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": statistics.median(times), "peak_bytes": peak, "output_bytes": len(output)}
+
+
+def compare(results, baseline, threshold, min_seconds=0.0):
+    failures = []
+    for name, metrics in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        for metric in METRICS:
+            if metric == "seconds" and metrics[metric] - base[metric] < min_seconds:
+                continue
+            if base[metric] and metrics[metric] > base[metric] * (1 + threshold):
+                failures.append(f"{name}: {metric} {base[metric]:.4g} -> {metrics[metric]:.4g} "
+                                f"(+{(metrics[metric] / base[metric] - 1) * 100:.0f}%)")
+    return failures
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression as a fraction (default 0.25)")
+    parser.add_argument("--min-time-ms", type=float, default=2.0, help="ignore slowdowns smaller than this (default 2 ms)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("-k", dest="only", help="only run cases whose name contains this")
+    args = parser.parse_args()
+
+    import fpdf
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = build_cases(tmp)
+        print(f"{'case':<24} {'time':>10} {'peak mem':>10} {'output':>10}")
+        for name, fn in cases.items():
+            if args.only and args.only not in name:
+                continue
+            results[name] = run_case(fn, args.repeats)
+            r = results[name]
+            print(f"{name:<24} {r['seconds'] * 1e3:>8.1f}ms {r['peak_bytes'] / 1e6:>8.1f}MB {r['output_bytes'] / 1e3:>8.0f}KB")
+
+    report = {
+        "meta": {
+            "commit": _commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "fpdf": getattr(fpdf, "__version__", None),
+        },
+        "cases": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(results, json.load(f), args.threshold, args.min_time_ms / 1e3)
+        for failure in failures:
+            print("REGRESSION", failure)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
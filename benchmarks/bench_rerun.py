@@ -0,0 +1,73 @@
+# Rerun latency of the logged-in Streamlit page, measured with AppTest.
+#
+#   python benchmarks/bench_rerun.py --reruns 50
+#   python benchmarks/bench_rerun.py --app /tmp/old_app.py   # compare a checkout
+#
+# Each app is measured in a fresh interpreter so the first run reflects a
+# cold start (module imports, cached resources) and the rest are keystroke
+# reruns of the "c) Purpose of the valuation" text area.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_APP = os.path.join(ROOT, "value app final.py")
+
+
+def measure(app, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app, default_timeout=60)
+    at.session_state["logged_in"] = True
+    at.session_state["username"] = "bench"
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    timings = []
+    for i in range(reruns):
+        at.text_area[0].input(f"Mortgage valuation, revision {i}")
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    timings.sort()
+    return {
+        "cold_ms": cold * 1e3,
+        "rerun_p50_ms": statistics.median(timings) * 1e3,
+        "rerun_p95_ms": timings[int(len(timings) * 0.95) - 1] * 1e3,
+        "modules": sorted(m for m in ("fpdf",) if m in sys.modules),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", action="append", help="app script(s) to measure")
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        os.chdir(ROOT)
+        sys.path.insert(0, ROOT)
+        import benchmarks.fixtures  # noqa: F401  (stand-in logo when the real one is missing)
+        print(json.dumps(measure(args.app[0], args.reruns)))
+        return
+
+    for app in args.app or [DEFAULT_APP]:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", "--app", os.path.abspath(app), "--reruns", str(args.reruns)],
+            capture_output=True, text=True, check=True,
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{os.path.basename(app)}: cold {result['cold_ms']:.0f} ms, "
+              f"rerun p50 {result['rerun_p50_ms']:.1f} ms, p95 {result['rerun_p95_ms']:.1f} ms, "
+              f"loaded {', '.join(result['modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Login latency: legacy users.json vs the SQLite user store.
+#
+#   python benchmarks/bench_users.py --sizes 10000 100000 --logins 500
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from propiq.users import JSONUserStore, SQLiteUserStore, login_user  # noqa: E402
+
+
+def time_logins(store, names, logins):
+    picks = [random.choice(names) for _ in range(logins)]
+    start = time.perf_counter()
+    for name in picks:
+        ok, _ = login_user(name, "pw-" + name, store=store)
+        assert ok
+    return (time.perf_counter() - start) / logins
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'backend':>8} {'login avg':>12} {'register':>12}")
+    for n in args.sizes:
+        names = [f"valuer{i:07d}" for i in range(n)]
+        users = {u: "pw-" + u for u in names}
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "users.json")
+            with open(json_path, "w") as f:
+                json.dump(users, f, indent=4)
+            stores = {
+                "json": JSONUserStore(json_path),
+                "sqlite": SQLiteUserStore(os.path.join(tmp, "users.sqlite3")),
+            }
+            stores["sqlite"].import_users(users)
+            for backend, store in stores.items():
+                # the JSON store is O(N) per call, so sample fewer logins
+                logins = max(10, args.logins // 20) if backend == "json" else args.logins
+                login = time_logins(store, names, logins)
+                start = time.perf_counter()
+                store.add_user(f"new-{backend}", "pw")
+                register = time.perf_counter() - start
+                print(f"{n:>8} {backend:>8} {login * 1e3:>10.3f}ms {register * 1e3:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# Vectorised valuation calculator: batches of properties and sensitivity grids.
+#
+#   python benchmarks/bench_valuation.py --properties 100000 --grid 1000
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from propiq import valuation  # noqa: E402
+
+
+def timed(label, fn, scenarios):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<42} {scenarios:>12,} scenarios {elapsed * 1e3:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--properties", type=int, default=100_000)
+    parser.add_argument("--comparables", type=int, default=8)
+    parser.add_argument("--grid", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n, k, g = args.properties, args.comparables, args.grid
+    prices = rng.uniform(5e6, 1e8, (n, k))
+    extents = rng.uniform(5, 60, (n, k))
+    adjustments = rng.uniform(-0.15, 0.15, (n, k))
+    subject = rng.uniform(5, 60, n)
+
+    timed("market approach (batch)", lambda: valuation.market_approach(prices, extents, adjustments, subject), n)
+    timed("income approach (batch)", lambda: valuation.income_approach(
+        rng.uniform(6e5, 6e6, n), rng.uniform(0.04, 0.1, n), 0.08, 0.15), n)
+    timed("cost approach (batch)", lambda: valuation.cost_approach(
+        subject, rng.uniform(5e5, 5e6, n), rng.uniform(800, 6000, n), 12_000, rng.uniform(0, 60, n), 60), n)
+    timed("income grid: yield x rent", lambda: valuation.sensitivity_grid(
+        valuation.income_approach, "yield_rate", np.linspace(0.04, 0.1, g),
+        "annual_rent", np.linspace(1e6, 3e6, g), voids=0.08, outgoings=0.15), g * g)
+    timed("market grid: adjustment x rate", lambda: valuation.sensitivity_grid(
+        valuation.rate_approach, "adjustment", np.linspace(-0.2, 0.2, g),
+        "rate", np.linspace(5e5, 2e6, g), subject_extent=20), g * g)
+
+
+if __name__ == "__main__":
+    main()
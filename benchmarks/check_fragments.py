@@ -0,0 +1,102 @@
+# Checks that reports rendered through the section fragment cache are
+# byte-identical to uncached renders (CreationDate aside).
+#
+#   python benchmarks/check_fragments.py
+#   python benchmarks/check_fragments.py --font-dir fonts/   # with TrueType runs
+#
+# Every scenario renders the same fields with cache=None and with a shared
+# FragmentCache (cold and warm) and compares the bytes. Exits 1 on any
+# difference. The TrueType scenario needs a font in --font-dir (default
+# PROPIQ_FONT_DIR) that covers some of its text and is skipped otherwise.
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import SENTENCE, photo, report_fields  # noqa: E402
+
+UNICODE_TEXT = "Owner: Łukasz Żółć — කොළඹ 07, € 1,250 per perch"
+FIXED_NOW = datetime(2026, 1, 20, 9, 30, 0)
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return FIXED_NOW
+
+
+def _strip(pdf_bytes):
+    return re.sub(rb"/CreationDate \([^)]*\)", b"", pdf_bytes)
+
+
+def scenarios(photo_dir):
+    photos = []
+    for i in range(2):
+        path = os.path.join(photo_dir, f"photo-{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(photo(800, 600, seed=i))
+        photos.append(path)
+    typical = report_fields("typical", photos)
+    longer = dict(typical, **{"c) Purpose of the valuation": SENTENCE * 30})
+    shorter = dict(typical, **{"c) Purpose of the valuation": SENTENCE})
+    comparables = dict(typical, **{"o) Comparable sales": [
+        ["2025-03-01", "No. 12, Station Road, Nugegoda", "land", "12.5", "45,000,000", "0.42 km"],
+        ["2025-04-02", "-", "house", "-", "30,000,000", "1.20 km"],
+    ] * 12})
+    unicode_fields = dict(typical, **{"d) Identification of the property": UNICODE_TEXT,
+                                      "i) Market value evidence": (UNICODE_TEXT + " ") * 8})
+    unicode_changed = dict(unicode_fields, **{"c) Purpose of the valuation": SENTENCE * 30})
+    # (name, fields, needs TrueType); each renders twice so the second run
+    # replays what the first one cached
+    return [
+        ("typical", typical, False),
+        ("earlier section grew", longer, False),
+        ("earlier section shrank", shorter, False),
+        ("comparables table", comparables, False),
+        ("truetype", unicode_fields, True),
+        ("truetype, earlier section changed", unicode_changed, True),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--font-dir", help="TrueType fonts for the unicode scenarios (default PROPIQ_FONT_DIR)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    if args.font_dir:
+        os.environ["PROPIQ_FONT_DIR"] = args.font_dir
+    os.environ.setdefault("PROPIQ_FONT_CACHE_DIR", os.path.join(tmp.name, "font_cache"))
+
+    from propiq import fonts, report
+    from propiq.fragments import FragmentCache
+
+    report.datetime = _FrozenDatetime
+    has_ttf = any(fonts.family_for(c) for c in UNICODE_TEXT if not fonts.is_latin1(c))
+    cache = FragmentCache()
+    failures = 0
+    for name, fields, needs_ttf in scenarios(tmp.name):
+        if needs_ttf and not has_ttf:
+            print(f"SKIP {name}: no font covering the test text in {fonts.config.FONT_DIR}")
+            continue
+        expected = _strip(report.generate_pdf(fields, dest="S", report_id="PROPIQ-CHECK", cache=None)[1])
+        if needs_ttf and b"/FontFile2" not in expected:
+            print(f"FAIL {name}: no TrueType font embedded")
+            failures += 1
+            continue
+        for run in ("cold", "warm"):
+            hits = cache.hits
+            got = _strip(report.generate_pdf(fields, dest="S", report_id="PROPIQ-CHECK", cache=cache)[1])
+            ok = got == expected
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {name} ({run}, {cache.hits - hits} sections replayed)")
+    tmp.cleanup()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# Synthetic, deterministic report inputs shared by the benchmark scripts.
+import io
+import os
+import tempfile
+from datetime import date
+
+TEXT_FIELDS = (
+    "c) Purpose of the valuation", "d) Identification of the property", "g) Nature of the property",
+    "h) Site profile", "i) Market value evidence", "j) Assumptions and reservations", "k) Valuation approach",
+)
+SENTENCE = ("The subject property is a two storied residential building on a bare land of 20 perches "
+            "with access from a motorable road. ")
+
+
+def report_fields(text="typical", photo_paths=()):
+    # text: "empty" (nothing filled in), "typical" (a paragraph per field) or
+    # "maximal" (several long paragraphs per field)
+    fields = {}
+    if text != "empty":
+        body = SENTENCE * 6 if text == "typical" else "\n\n".join([SENTENCE * 12] * 6)
+        fields = {key: body for key in TEXT_FIELDS}
+        fields.update({
+            "a) Identification and status of the valuer": "A. Perera, Chartered Valuation Surveyor",
+            "b) Client details": "Bank of Ceylon",
+            "e) Basis of value adopted": "Market Value",
+            "f) Valuation date": date(2026, 1, 15),
+            "l) Amount of valuation": "LKR 45,000,000",
+            "m) Date of the valuation report": date(2026, 1, 20),
+            "q) Selected Property Parts": ["Living Room", "Bedroom", "Dining Room"],
+        })
+    fields["r) Property Images"] = [{"part": f"Part {i}", "path": p} for i, p in enumerate(photo_paths)]
+    return fields
+
+
+def photo(width, height, seed=0, noise=12, quality=85):
+    # JPEG with smooth gradients plus sensor-like noise; compresses roughly
+    # like a real photo rather than a flat colour or pure noise.
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([
+        127 + 100 * np.sin(x / width * 6.3 + seed),
+        127 + 100 * np.cos(y / height * 4.1 + seed),
+        127 + 60 * np.sin((x + y) / (width + height) * 9.0),
+    ], axis=-1)
+    pixels = np.clip(base + rng.normal(0, noise, base.shape), 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+def stand_in_logo():
+    # Without the packaged logo (or PROPIQ_LOGO) the cover is rendered without
+    # it; point PROPIQ_LOGO at a generated PNG so benchmark reports still pay
+    # for placing a logo. Must run before propiq.config is imported.
+    packaged = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "propiq", "static", "usjp-logo.png")
+    if os.environ.get("PROPIQ_LOGO") or os.path.exists(packaged):
+        return
+    from PIL import Image
+
+    path = os.path.join(tempfile.gettempdir(), "propiq-bench-logo.png")
+    if not os.path.exists(path):
+        Image.new("RGB", (300, 300), (128, 0, 0)).save(path, "PNG")
+    os.environ["PROPIQ_LOGO"] = path
+
+
+stand_in_logo()
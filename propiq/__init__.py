@@ -0,0 +1 @@
+# PROPIQ - valuation report generator (University of Sri Jayewardenepura)
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date
+
+from propiq import config
+
+# --- REPORT ARCHIVE ---
+# Every generated report is kept as content-addressed blobs: the PDF, the
+# form inputs as JSON and each photo it used. A photo shared by several
+# reports (or regenerations of the same report) is stored once. Blobs that
+# compress well (the fields JSON) are stored zlib-compressed; PDFs and JPEGs
+# are mostly compressed already and are only compressed when that saves at
+# least 10%. The SQLite index lists a user's recent reports from one index
+# range and re-downloads read the stored PDF instead of rendering again.
+#
+# Writers take SQLite's write lock (BEGIN IMMEDIATE) for the whole change,
+# including creating and unlinking blob files, so a delete can never remove
+# a blob that a concurrent put is about to reference.
+
+RECENT_LIMIT = 50
+MIN_SAVING = 0.9
+# stored as ISO strings in the JSON, turned back into dates on the way out
+DATE_FIELDS = ("f) Valuation date", "m) Date of report", "m) Date of the valuation report")
+
+
+def property_key(text):
+    # First line of "d) Identification of the property", normalised so the
+    # same property typed twice indexes the same way.
+    for line in str(text or "").splitlines():
+        line = " ".join(line.split()).lower()
+        if line:
+            return line[:120]
+    return ""
+
+
+class ReportArchive:
+    def __init__(self, path=None, blob_dir=None):
+        self.path = path or config.ARCHIVE_DB
+        self.blob_dir = blob_dir or config.ARCHIVE_DIR
+        self._local = threading.local()
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reports (
+                report_id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                created REAL NOT NULL,
+                valuation_date TEXT,
+                property TEXT,
+                amount TEXT,
+                filename TEXT NOT NULL,
+                pdf TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                pdf_bytes INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS reports_user ON reports (username, created);
+            CREATE INDEX IF NOT EXISTS reports_date ON reports (valuation_date);
+            CREATE INDEX IF NOT EXISTS reports_property ON reports (property);
+            CREATE INDEX IF NOT EXISTS reports_created ON reports (created);
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                raw_size INTEGER NOT NULL,
+                refs INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS report_blobs (
+                report_id TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (report_id, hash)
+            ) WITHOUT ROWID;
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit; writes open their own IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- BLOBS ---
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _add_blob(self, conn, data, compress=True):
+        # Stores data (once) and takes a reference; returns its hash.
+        digest = hashlib.sha256(data).hexdigest()
+        row = conn.execute("SELECT codec FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None or not os.path.exists(self._blob_path(digest)):
+            codec, stored = "raw", data
+            if compress:
+                packed = zlib.compress(data, 6)
+                if len(packed) < len(data) * MIN_SAVING:
+                    codec, stored = "zlib", packed
+            path = self._blob_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(stored)
+            os.replace(tmp, path)
+            conn.execute(
+                "INSERT INTO blobs (hash, codec, size, raw_size, refs) VALUES (?, ?, ?, ?, 0) "
+                "ON CONFLICT (hash) DO UPDATE SET codec = excluded.codec, size = excluded.size",
+                (digest, codec, len(stored), len(data)),
+            )
+        return digest
+
+    def _read_blob(self, digest):
+        row = self._conn().execute("SELECT codec FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        with open(self._blob_path(digest), "rb") as f:
+            data = f.read()
+        return zlib.decompress(data) if row["codec"] == "zlib" else data
+
+    # --- REPORTS ---
+    def put(self, report_id, username, filename, pdf_bytes, fields, created=None):
+        # Archives one generated report. Photos are stored under their own
+        # hash and the stored fields refer to them by hash instead of by
+        # (session-local) path.
+        images = []
+        for img in fields.get("r) Property Images") or []:
+            data = None
+            if img.get("path") and os.path.exists(img["path"]):
+                with open(img["path"], "rb") as f:
+                    data = f.read()
+            images.append((img.get("part"), data))
+
+        with self._write() as conn:
+            refs = []
+            stored_images = []
+            for part, data in images:
+                digest = self._add_blob(conn, data, compress=False) if data is not None else None
+                stored_images.append({"part": part, "image": digest})
+                refs.append(digest)
+            stored = dict(fields, **{"r) Property Images": stored_images})
+            fields_hash = self._add_blob(conn, json.dumps(stored, sort_keys=True, default=str).encode("utf-8"))
+            pdf_hash = self._add_blob(conn, pdf_bytes)
+            refs += [fields_hash, pdf_hash]
+            valuation_date = fields.get("f) Valuation date")
+            conn.execute(
+                "INSERT INTO reports (report_id, username, created, valuation_date, property, amount, filename, "
+                "pdf, fields, pdf_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (report_id, username, created or time.time(),
+                 valuation_date.isoformat() if hasattr(valuation_date, "isoformat") else valuation_date,
+                 property_key(fields.get("d) Identification of the property")), fields.get("l) Amount of valuation"),
+                 filename, pdf_hash, fields_hash, len(pdf_bytes)),
+            )
+            for digest in set(d for d in refs if d):
+                conn.execute("INSERT INTO report_blobs (report_id, hash) VALUES (?, ?)", (report_id, digest))
+                conn.execute("UPDATE blobs SET refs = refs + 1 WHERE hash = ?", (digest,))
+        self.evict(keep=report_id)
+        return report_id
+
+    def recent(self, username, limit=RECENT_LIMIT):
+        # Newest first, straight off the (username, created) index.
+        return [dict(r) for r in self._conn().execute(
+            "SELECT report_id, created, valuation_date, property, amount, filename, pdf_bytes "
+            "FROM reports WHERE username = ? ORDER BY created DESC LIMIT ?", (username, limit))]
+
+    def find(self, username=None, report_id=None, valuation_date=None, property=None, limit=RECENT_LIMIT):
+        # Any combination of filters; property matches by prefix.
+        sql = ("SELECT report_id, username, created, valuation_date, property, amount, filename, pdf_bytes "
+               "FROM reports WHERE 1 = 1")
+        params = []
+        if username:
+            sql += " AND username = ?"
+            params.append(username)
+        if report_id:
+            sql += " AND report_id = ?"
+            params.append(report_id)
+        if valuation_date:
+            sql += " AND valuation_date = ?"
+            params.append(valuation_date.isoformat() if hasattr(valuation_date, "isoformat") else valuation_date)
+        if property:
+            key = property_key(property)
+            sql += " AND property >= ? AND property < ?"
+            params += [key, key + "\U0010ffff"]
+        sql += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def pdf(self, report_id):
+        # (filename, bytes) of the stored PDF, or None
+        row = self._conn().execute("SELECT filename, pdf FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+        if row is None:
+            return None
+        data = self._read_blob(row["pdf"])
+        return (row["filename"], data) if data is not None else None
+
+    def fields(self, report_id):
+        # The archived inputs; photos point at the archived copies, so the
+        # result can be passed straight back to generate_pdf.
+        row = self._conn().execute("SELECT fields FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+        if row is None:
+            return None
+        fields = json.loads(self._read_blob(row["fields"]))
+        for key in DATE_FIELDS:
+            if fields.get(key):
+                fields[key] = date.fromisoformat(fields[key])
+        fields["r) Property Images"] = [
+            {"part": img["part"], "path": self._blob_path(img["image"])}
+            for img in fields.get("r) Property Images") or [] if img.get("image")
+        ]
+        return fields
+
+    def delete(self, report_ids):
+        with self._write() as conn:
+            return self._delete(conn, report_ids)
+
+    def _delete(self, conn, report_ids):
+        removed = 0
+        for report_id in report_ids:
+            hashes = [r[0] for r in conn.execute("SELECT hash FROM report_blobs WHERE report_id = ?", (report_id,))]
+            removed += conn.execute("DELETE FROM reports WHERE report_id = ?", (report_id,)).rowcount
+            conn.execute("DELETE FROM report_blobs WHERE report_id = ?", (report_id,))
+            for digest in hashes:
+                conn.execute("UPDATE blobs SET refs = refs - 1 WHERE hash = ?", (digest,))
+        for (digest,) in conn.execute("SELECT hash FROM blobs WHERE refs <= 0").fetchall():
+            conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+        return removed
+
+    def size_bytes(self):
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self, retention_days=None, max_mb=None, keep=None, now=None):
+        # Retention first (reports older than retention_days), then the oldest
+        # reports until the stored blobs fit in max_mb. `keep` is never evicted.
+        retention_days = config.ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+        max_mb = config.ARCHIVE_MAX_MB if max_mb is None else max_mb
+        removed = 0
+        if retention_days:
+            cutoff = (now or time.time()) - retention_days * 86400
+            expired = [r[0] for r in self._conn().execute(
+                "SELECT report_id FROM reports WHERE created < ? AND report_id IS NOT ?", (cutoff, keep))]
+            if expired:
+                removed += self.delete(expired)
+        if max_mb:
+            limit = max_mb * 2**20
+            while self.size_bytes() > limit:
+                oldest = [r[0] for r in self._conn().execute(
+                    "SELECT report_id FROM reports WHERE report_id IS NOT ? ORDER BY created LIMIT 16", (keep,))]
+                if not oldest:
+                    break
+                removed += self.delete(oldest)
+        return removed
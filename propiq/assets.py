@@ -0,0 +1,89 @@
+import functools
+import logging
+import os
+import urllib.request
+
+from propiq import config
+
+
+# --- STATIC ASSETS ---
+# Files shipped with the package live in propiq/static/.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+PACKAGED_LOGO = os.path.join(STATIC_DIR, "usjp-logo.png")
+
+logger = logging.getLogger(__name__)
+_logo = None
+_logo_warned = False
+
+
+def read_text_asset(name):
+    with open(os.path.join(STATIC_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _logo_path():
+    # PROPIQ_LOGO override, otherwise the packaged copy
+    return config.LOGO_FILE or PACKAGED_LOGO
+
+
+def get_logo():
+    # Loaded once per process. Without a logo file this returns None (and
+    # logs a warning once) so reports are rendered without it; the lookup is
+    # not cached, so adding the file later takes effect without a restart.
+    global _logo, _logo_warned
+    if _logo is None:
+        path = _logo_path()
+        if not os.path.exists(path):
+            if not _logo_warned:
+                logger.warning("University logo not found at %s; reports are rendered without it. Run "
+                               "`python -m propiq.assets fetch-logo` or point PROPIQ_LOGO at a copy.", path)
+                _logo_warned = True
+            return None
+        with open(path, "rb") as f:
+            data = f.read()
+        # FPDF's parse of it (image_info) is left to the first report, so
+        # showing the logo in the sidebar does not import fpdf
+        _logo = {"path": path, "bytes": data}
+    return _logo
+
+
+def fetch_logo(dest=PACKAGED_LOGO):
+    # One-off setup step: downloads the logo from LOGO_URL into the package.
+    with urllib.request.urlopen(config.LOGO_URL, timeout=30) as resp:
+        data = resp.read()
+    tmp = dest + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, dest)
+    return dest
+
+
+@functools.lru_cache(maxsize=256)
+def image_info(path):
+    # FPDF's parsed form of an image file (dimensions, colour space, raw
+    # stream). Image paths handed to the report are content-addressed, so a
+    # path always refers to the same bytes and can be parsed once per process.
+    from fpdf import FPDF
+
+    # only PyFPDF exposes its parsers; other FPDF versions parse on demand
+    kind = "_parsepng" if path.lower().endswith(".png") else "_parsejpg"
+    parse = getattr(FPDF(), kind, None)
+    return parse(path) if parse else None
+
+
+def place_image(pdf, path, info=None, **kwargs):
+    # pdf.image() with pre-parsed image info, so FPDF does not re-read and
+    # re-decode the same file for every report.
+    info = info or image_info(path)
+    if info is not None and isinstance(getattr(pdf, "images", None), dict) and path not in pdf.images:
+        # FPDF drops 'data' from its copy on output, so never hand over ours
+        pdf.images[path] = dict(info, i=len(pdf.images) + 1)
+    pdf.image(path, **kwargs)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["fetch-logo"]:
+        sys.exit("usage: python -m propiq.assets fetch-logo")
+    print(f"logo written to {fetch_logo()}")
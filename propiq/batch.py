@@ -0,0 +1,148 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+from propiq import config
+
+# --- HEADLESS BATCH GENERATION ---
+# Records use the same keys as the Streamlit form's `fields` dict. In CSV
+# files the list-valued columns are "|"-separated:
+#   q) Selected Property Parts   Bedroom|Dining Room
+#   r) Property Images           Subject Property=front.jpg|Bedroom=bed1.jpg
+# Image paths are resolved against the --images directory.
+#
+#   python -m propiq.batch records.csv --images photos/ --out reports.zip --workers 8
+
+DATE_FIELDS = ("f) Valuation date", "m) Date of the valuation report")
+PARTS_FIELD = "q) Selected Property Parts"
+IMAGES_FIELD = "r) Property Images"
+
+
+def load_records(path):
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return [dict(row) for row in csv.DictReader(f)]
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def normalize_record(record, image_dir=None):
+    fields = {k: v for k, v in record.items() if v not in (None, "")}
+    for key in DATE_FIELDS:
+        if isinstance(fields.get(key), str):
+            fields[key] = date.fromisoformat(fields[key])
+    if isinstance(fields.get(PARTS_FIELD), str):
+        fields[PARTS_FIELD] = [p.strip() for p in fields[PARTS_FIELD].split("|") if p.strip()]
+    images = fields.get(IMAGES_FIELD)
+    if isinstance(images, str):
+        images = [
+            {"part": part.strip(), "path": path.strip()}
+            for part, _, path in (item.partition("=") for item in images.split("|") if item.strip())
+        ]
+    if images:
+        fields[IMAGES_FIELD] = [
+            dict(img, path=os.path.join(image_dir, img["path"]) if image_dir else img["path"])
+            for img in images
+        ]
+    return fields
+
+
+def _render(index, record, image_dir):
+    # Runs in a worker process; returns (index, file name, pdf bytes, error).
+    from propiq.images import ingest_image
+    from propiq.report import generate_pdf
+
+    try:
+        fields = normalize_record(record, image_dir)
+        for img in fields.get(IMAGES_FIELD, []):
+            if not os.path.exists(img["path"]):
+                raise FileNotFoundError(f"image not found: {img['path']}")
+            with open(img["path"], "rb") as f:
+                img["path"] = ingest_image(f.read())["path"]
+        name, pdf_bytes = generate_pdf(fields, dest="S")
+        return index, name, pdf_bytes, None
+    except Exception as e:
+        return index, None, None, f"{type(e).__name__}: {e}"
+
+
+def iter_reports(records, image_dir=None, workers=None):
+    # Yields (index, file name, pdf bytes, error) as reports complete. At most
+    # two records per worker are in flight, so memory stays flat for large
+    # batches.
+    workers = workers or config.BATCH_WORKERS or os.cpu_count() or 1
+    pending = set()
+    records = iter(enumerate(records))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for index, record in records:
+                pending.add(pool.submit(_render, index, record, image_dir))
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def run_batch(records, output, image_dir=None, workers=None):
+    # Writes every report into `output` (a .zip file or a directory) and
+    # returns one result dict per record, in input order.
+    results = []
+    written = set()
+    to_zip = output.lower().endswith(".zip")
+    if to_zip:
+        folder = os.path.dirname(output)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # "x": an existing archive from an earlier run is never replaced
+        archive = zipfile.ZipFile(output, "x", zipfile.ZIP_DEFLATED)
+    else:
+        os.makedirs(output, exist_ok=True)
+    try:
+        for index, name, pdf_bytes, error in iter_reports(records, image_dir, workers):
+            if error is None:
+                # never overwrite a report (from this run or an earlier one)
+                try:
+                    if name in written:
+                        raise FileExistsError(f"duplicate output name {name}")
+                    if to_zip:
+                        archive.writestr(name, pdf_bytes)
+                    else:
+                        with open(os.path.join(output, name), "xb") as f:
+                            f.write(pdf_bytes)
+                    written.add(name)
+                except FileExistsError as e:
+                    name, error = None, f"{type(e).__name__}: {e}"
+            results.append({"record": index, "file": name, "error": error})
+    finally:
+        if to_zip:
+            archive.close()
+    return sorted(results, key=lambda r: r["record"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m propiq.batch", description="Generate valuation reports in bulk.")
+    parser.add_argument("records", help="CSV or JSONL file with one report per row")
+    parser.add_argument("--images", help="directory that image paths are relative to")
+    parser.add_argument("--out", default="reports.zip", help="output .zip file or directory (default: reports.zip)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: PROPIQ_BATCH_WORKERS or CPU count)")
+    args = parser.parse_args(argv)
+    if args.out.lower().endswith(".zip") and os.path.exists(args.out):
+        parser.error(f"{args.out} already exists; choose another --out or remove it first")
+
+    results = run_batch(load_records(args.records), args.out, args.images, args.workers)
+    failed = [r for r in results if r["error"]]
+    for r in failed:
+        print(f"record {r['record']}: {r['error']}", file=sys.stderr)
+    print(f"{len(results) - len(failed)} report(s) written to {args.out}, {len(failed)} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import csv
+import math
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, timedelta
+
+from propiq import config
+
+# --- COMPARABLE SALES STORE ---
+# Transactions are indexed on a fixed lat/lon grid (CELL_DEG degrees, about
+# 1.1 km) together with property type and sale date. A radius query turns the
+# search circle into one contiguous range of cell ids per grid row, lets the
+# index pick candidates, and does the exact distance check on that small set.
+#
+#   python -m propiq.comparables import sales.csv
+#
+# CSV columns: lat, lon, property_type, land_extent, sale_date (YYYY-MM-DD),
+# price, location.
+
+CELL_DEG = 0.01
+GRID_COLS = int(360 / CELL_DEG)
+EARTH_RADIUS_KM = 6371.0
+CSV_COLUMNS = ("lat", "lon", "property_type", "land_extent", "sale_date", "price", "location")
+
+
+def grid_cell(lat, lon):
+    return int((lat + 90) // CELL_DEG) * GRID_COLS + int((lon + 180) // CELL_DEG)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class ComparablesStore:
+    def __init__(self, path=None):
+        self.path = path or config.COMPARABLES_DB
+        self._local = threading.local()
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sales (
+                id INTEGER PRIMARY KEY,
+                cell INTEGER NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                property_type TEXT NOT NULL,
+                land_extent REAL,
+                sale_date TEXT NOT NULL,
+                price REAL NOT NULL,
+                location TEXT
+            );
+            CREATE INDEX IF NOT EXISTS sales_cell ON sales (cell, property_type, sale_date);
+            CREATE INDEX IF NOT EXISTS sales_type_date ON sales (property_type, sale_date);
+            CREATE INDEX IF NOT EXISTS sales_extent ON sales (land_extent);
+        """)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM sales").fetchone()[0]
+
+    def has_sales(self):
+        return self._conn().execute("SELECT 1 FROM sales LIMIT 1").fetchone() is not None
+
+    def property_types(self):
+        return [r[0] for r in self._conn().execute("SELECT DISTINCT property_type FROM sales ORDER BY 1")]
+
+    def insert_many(self, rows):
+        # rows: iterables of (lat, lon, property_type, land_extent, sale_date, price, location)
+        conn = self._conn()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO sales (cell, lat, lon, property_type, land_extent, sale_date, price, location) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((grid_cell(r[0], r[1]), *r) for r in rows),
+            )
+            return conn.total_changes - before
+
+    def import_csv(self, path, chunk_size=50_000):
+        total, chunk = 0, []
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                chunk.append((
+                    float(row["lat"]), float(row["lon"]), row["property_type"].strip(),
+                    float(row["land_extent"]) if row.get("land_extent") else None,
+                    date.fromisoformat(row["sale_date"].strip()).isoformat(),
+                    float(row["price"]), row.get("location", "").strip(),
+                ))
+                if len(chunk) >= chunk_size:
+                    total += self.insert_many(chunk)
+                    chunk = []
+        if chunk:
+            total += self.insert_many(chunk)
+        self._conn().execute("ANALYZE")
+        return total
+
+    def nearest(self, lat, lon, radius_km=2.0, limit=10, property_type=None, months=None,
+                min_extent=None, max_extent=None, today=None):
+        # Nearest sales within radius_km, closest first, as dicts with a
+        # distance_km key.
+        dlat = radius_km / 111.32
+        dlon = radius_km / max(111.32 * math.cos(math.radians(lat)), 1e-6)
+        row0, row1 = int((lat - dlat + 90) // CELL_DEG), int((lat + dlat + 90) // CELL_DEG)
+        col0, col1 = int((lon - dlon + 180) // CELL_DEG), int((lon + dlon + 180) // CELL_DEG)
+        ranges = " OR ".join(["cell BETWEEN ? AND ?"] * (row1 - row0 + 1))
+        params = []
+        for row in range(row0, row1 + 1):
+            params += [row * GRID_COLS + col0, row * GRID_COLS + col1]
+        # the grid index is always the selective one for radius queries; left
+        # to itself the planner tends to pick (property_type, sale_date)
+        sql = f"SELECT * FROM sales INDEXED BY sales_cell WHERE ({ranges})"
+        if property_type:
+            sql += " AND property_type = ?"
+            params.append(property_type)
+        if months:
+            since = (today or date.today()) - timedelta(days=round(months * 30.44))
+            sql += " AND sale_date >= ?"
+            params.append(since.isoformat())
+        if min_extent is not None:
+            sql += " AND land_extent >= ?"
+            params.append(min_extent)
+        if max_extent is not None:
+            sql += " AND land_extent <= ?"
+            params.append(max_extent)
+
+        found = []
+        for row in self._conn().execute(sql, params):
+            distance = haversine_km(lat, lon, row["lat"], row["lon"])
+            if distance <= radius_km:
+                found.append(dict(row, distance_km=distance))
+        found.sort(key=lambda r: r["distance_km"])
+        return found[:limit]
+
+
+# --- REPORT FORMATTING ---
+# "o) Comparable sales" holds the rows picked in the app, already formatted,
+# and is printed as a table under 06.0 (like "n) Valuation calculation" under 09.0).
+EVIDENCE_COLUMNS = ("Date", "Location", "Type", "Extent (P)", "Price (LKR)", "Distance")
+
+
+def evidence_rows(rows):
+    # One row of display strings per comparable, in EVIDENCE_COLUMNS order.
+    return [
+        [
+            str(r["sale_date"]), r.get("location") or "-", r["property_type"],
+            f"{r['land_extent']:g}" if r.get("land_extent") is not None else "-",
+            f"{r['price']:,.0f}", f"{r['distance_km']:.2f} km",
+        ]
+        for r in rows
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m propiq.comparables", description="Manage the comparable sales store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="bulk import a CSV of sales")
+    imp.add_argument("csv")
+    imp.add_argument("--db", default=None, help="database path (default: PROPIQ_COMPARABLES_DB)")
+    args = parser.parse_args(argv)
+
+    store = ComparablesStore(args.db)
+    imported = store.import_csv(args.csv)
+    print(f"imported {imported} sale(s); {store.count()} in {store.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
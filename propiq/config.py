@@ -0,0 +1,85 @@
+import os
+
+# --- SETTINGS ---
+# Everything can be overridden with PROPIQ_* environment variables so the
+# Streamlit app and the helper scripts share the same configuration.
+DATA_DIR = os.environ.get("PROPIQ_DATA_DIR", "propiq_data")
+
+# --- USERS ---
+# users.json is the original store; it is only read once to migrate into the
+# configured backend ("sqlite" or the legacy "json").
+USERS_FILE = os.environ.get("PROPIQ_USERS_FILE", "users.json")
+USER_STORE = os.environ.get("PROPIQ_USER_STORE", "sqlite")
+USERS_DB = os.environ.get("PROPIQ_USERS_DB", os.path.join(DATA_DIR, "users.sqlite3"))
+
+# --- IMAGES ---
+# Uploaded photos are downscaled to IMAGE_DPI at the width they are printed
+# at in the report (160 mm) and re-encoded as JPEG at IMAGE_QUALITY.
+IMAGE_CACHE_DIR = os.environ.get("PROPIQ_IMAGE_CACHE_DIR", os.path.join(DATA_DIR, "image_cache"))
+IMAGE_CACHE_MAX_MB = int(os.environ.get("PROPIQ_IMAGE_CACHE_MAX_MB", "512"))
+IMAGE_WIDTH_MM = 160
+IMAGE_DPI = int(os.environ.get("PROPIQ_IMAGE_DPI", "150"))
+IMAGE_QUALITY = int(os.environ.get("PROPIQ_IMAGE_QUALITY", "80"))
+
+# --- UPLOADS ---
+# Per-session copies of processed uploads; directories of sessions that
+# ended without cleaning up are swept after UPLOAD_SESSION_TTL_HOURS.
+UPLOAD_DIR = os.environ.get("PROPIQ_UPLOAD_DIR", os.path.join(DATA_DIR, "sessions"))
+UPLOAD_SESSION_TTL_HOURS = float(os.environ.get("PROPIQ_UPLOAD_SESSION_TTL_HOURS", "12"))
+
+# --- ASSETS ---
+# The university logo ships as propiq/static/usjp-logo.png (fetched from
+# LOGO_URL with `python -m propiq.assets fetch-logo`); PROPIQ_LOGO may point at
+# a local PNG/JPEG to use instead.
+LOGO_URL = "https://www.sjp.ac.lk/wp-content/uploads/2020/10/usjp-logo-300x300.png"
+LOGO_FILE = os.environ.get("PROPIQ_LOGO", "")
+
+# --- FONTS ---
+# TrueType fonts for text outside Latin-1 (Sinhala, Tamil, ...). None are
+# shipped: drop e.g. NotoSansSinhala-Regular.ttf / -Bold.ttf into FONT_DIR.
+# Parsed font metrics are pickled in FONT_CACHE_DIR.
+FONT_DIR = os.environ.get("PROPIQ_FONT_DIR", os.path.join(DATA_DIR, "fonts"))
+FONT_CACHE_DIR = os.environ.get("PROPIQ_FONT_CACHE_DIR", os.path.join(DATA_DIR, "font_cache"))
+
+# --- BATCH ---
+# Worker processes for headless batch generation (0 = one per CPU).
+BATCH_WORKERS = int(os.environ.get("PROPIQ_BATCH_WORKERS", "0"))
+
+# --- REPORT JOBS ---
+# Background generation for the Streamlit app: JOB_WORKERS threads, at most
+# JOB_MAX_PENDING queued or running jobs, finished jobs kept JOB_TTL_SECONDS.
+JOB_WORKERS = int(os.environ.get("PROPIQ_JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.environ.get("PROPIQ_JOB_MAX_PENDING", "16"))
+JOB_TTL_SECONDS = int(os.environ.get("PROPIQ_JOB_TTL_SECONDS", "900"))
+
+# --- REPORT FRAGMENTS ---
+# Rendered report sections kept in memory for reuse by later regenerations.
+FRAGMENT_CACHE_ENTRIES = int(os.environ.get("PROPIQ_FRAGMENT_CACHE_ENTRIES", "512"))
+
+# --- COMPARABLE SALES ---
+COMPARABLES_DB = os.environ.get("PROPIQ_COMPARABLES_DB", os.path.join(DATA_DIR, "comparables.sqlite3"))
+
+# --- REPORT ARCHIVE ---
+# Every generated report (inputs and PDF) is kept for ARCHIVE_RETENTION_DAYS
+# (0 = forever); the oldest reports are evicted once the stored blobs exceed
+# ARCHIVE_MAX_MB (0 = unbounded).
+ARCHIVE_DB = os.environ.get("PROPIQ_ARCHIVE_DB", os.path.join(DATA_DIR, "archive.sqlite3"))
+ARCHIVE_DIR = os.environ.get("PROPIQ_ARCHIVE_DIR", os.path.join(DATA_DIR, "archive"))
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("PROPIQ_ARCHIVE_RETENTION_DAYS", "730"))
+ARCHIVE_MAX_MB = int(os.environ.get("PROPIQ_ARCHIVE_MAX_MB", "2048"))
+
+# --- DRAFTS ---
+# Form state autosaved per user; changed fields are written at most once per
+# DRAFT_DEBOUNCE_SECONDS and drafts untouched for DRAFT_RETENTION_DAYS go.
+DRAFTS_DB = os.environ.get("PROPIQ_DRAFTS_DB", os.path.join(DATA_DIR, "drafts.sqlite3"))
+DRAFT_DEBOUNCE_SECONDS = float(os.environ.get("PROPIQ_DRAFT_DEBOUNCE_SECONDS", "2"))
+DRAFT_RETENTION_DAYS = int(os.environ.get("PROPIQ_DRAFT_RETENTION_DAYS", "90"))
+
+# --- METRICS ---
+# Off by default. When PROPIQ_METRICS=1, stage timings are appended to
+# METRICS_LOG (JSON lines) and summarised in Prometheus text format in
+# METRICS_FILE, and on http://127.0.0.1:METRICS_PORT/metrics if a port is set.
+METRICS = os.environ.get("PROPIQ_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_LOG = os.environ.get("PROPIQ_METRICS_LOG", os.path.join(DATA_DIR, "metrics.jsonl"))
+METRICS_FILE = os.environ.get("PROPIQ_METRICS_FILE", os.path.join(DATA_DIR, "metrics.prom"))
+METRICS_PORT = int(os.environ.get("PROPIQ_METRICS_PORT", "0"))
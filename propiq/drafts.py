@@ -0,0 +1,161 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date
+
+from propiq import config
+
+# --- DRAFTS ---
+# A draft is a set of named form values (widget keys) per user. Only the
+# fields that changed since the last save are written, one row each, so an
+# autosave after typing into one text area touches one small row instead of
+# rewriting the whole form. Listing a user's drafts reads the newest rows of
+# the (username, updated_at) index and stops at the limit, however many
+# drafts exist.
+
+LIST_LIMIT = 20
+
+
+def _encode(value):
+    if isinstance(value, date):
+        return json.dumps({"$date": value.isoformat()})
+    return json.dumps(value, default=str)
+
+
+def _decode(text):
+    value = json.loads(text)
+    if isinstance(value, dict) and set(value) == {"$date"}:
+        return date.fromisoformat(value["$date"])
+    return value
+
+
+class DraftStore:
+    def __init__(self, path=None):
+        self.path = path or config.DRAFTS_DB
+        self._local = threading.local()
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS drafts (
+                draft_id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                created REAL NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS drafts_user ON drafts (username, updated_at);
+            CREATE TABLE IF NOT EXISTS draft_fields (
+                draft_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (draft_id, name)
+            ) WITHOUT ROWID;
+        """)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, draft_id, username, changes, title=None, now=None):
+        # Upserts only the changed fields; creates the draft on first save.
+        now = now or time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO drafts (draft_id, username, title, created, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (draft_id) DO UPDATE SET updated_at = excluded.updated_at, "
+                "title = CASE WHEN ? IS NULL THEN drafts.title ELSE excluded.title END",
+                (draft_id, username, title or "", now, now, title),
+            )
+            conn.executemany(
+                "INSERT INTO draft_fields (draft_id, name, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (draft_id, name) DO UPDATE SET value = excluded.value",
+                ((draft_id, name, _encode(value)) for name, value in changes.items()),
+            )
+
+    def load(self, draft_id):
+        return {r["name"]: _decode(r["value"]) for r in self._conn().execute(
+            "SELECT name, value FROM draft_fields WHERE draft_id = ?", (draft_id,))}
+
+    def list(self, username, limit=LIST_LIMIT):
+        # Newest first.
+        return [dict(r) for r in self._conn().execute(
+            "SELECT draft_id, title, created, updated_at FROM drafts "
+            "WHERE username = ? ORDER BY updated_at DESC LIMIT ?", (username, limit))]
+
+    def latest(self, username):
+        drafts = self.list(username, limit=1)
+        return drafts[0] if drafts else None
+
+    def delete(self, draft_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM draft_fields WHERE draft_id = ?", (draft_id,))
+            conn.execute("DELETE FROM drafts WHERE draft_id = ?", (draft_id,))
+
+    def prune(self, retention_days=None, now=None):
+        retention_days = config.DRAFT_RETENTION_DAYS if retention_days is None else retention_days
+        if not retention_days:
+            return 0
+        cutoff = (now or time.time()) - retention_days * 86400
+        stale = [r[0] for r in self._conn().execute("SELECT draft_id FROM drafts WHERE updated_at < ?", (cutoff,))]
+        for draft_id in stale:
+            self.delete(draft_id)
+        return len(stale)
+
+
+# --- AUTOSAVE ---
+class DraftRecorder:
+    # Lives in a session's state. observe() is called once per rerun with the
+    # current form values; changes are collected and written by flush() at
+    # most once per debounce interval. The first value seen for a field that
+    # the draft does not have yet is only a baseline (a widget default), so
+    # opening an empty form does not create a draft.
+    def __init__(self, store, username, draft_id=None, saved=None, title_field=None, debounce=None):
+        self.store = store
+        self.username = username
+        self.draft_id = draft_id
+        self.saved = dict(saved or {})
+        self.title_field = title_field
+        self.debounce = config.DRAFT_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.pending = {}
+        self.last_flush = 0.0
+        self.last_saved_at = None
+
+    def observe(self, values, now=None):
+        for name, value in values.items():
+            if name not in self.saved:
+                self.saved[name] = value
+            elif value != self.saved[name]:
+                self.pending[name] = value
+            else:
+                self.pending.pop(name, None)
+        return self.flush(now=now, force=False)
+
+    def flush(self, now=None, force=True):
+        # Writes pending changes; returns True when something was saved.
+        now = now or time.time()
+        if not self.pending or (not force and now - self.last_flush < self.debounce):
+            return False
+        self.draft_id = self.draft_id or uuid.uuid4().hex
+        title = None
+        if self.title_field in self.pending:
+            lines = str(self.pending[self.title_field]).strip().splitlines()
+            title = " ".join(lines[0].split())[:80] if lines else ""
+        self.store.save(self.draft_id, self.username, self.pending, title=title, now=now)
+        self.saved.update(self.pending)
+        self.pending = {}
+        self.last_flush = self.last_saved_at = now
+        return True
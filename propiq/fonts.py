@@ -0,0 +1,285 @@
+import os
+import threading
+import unicodedata
+
+from propiq import config
+
+# --- UNICODE TEXT ---
+# The report is set in the core Arial font, which only covers Latin-1. Text
+# that needs more (Sinhala or Tamil deeds, owner names, addresses) is split
+# into runs by script and every run is written in a TrueType font from
+# FONT_DIR that covers it, e.g.
+#
+#   NotoSansSinhala-Regular.ttf  NotoSansSinhala-Bold.ttf  NotoSansTamil-Regular.ttf
+#
+# ("-Bold", "-Italic" and "-BoldItalic" files supply the styles; a missing
+# style falls back to the regular file). Font metrics are parsed once: fpdf
+# pickles them into FONT_CACHE_DIR and the parsed dict is kept for the life
+# of the process, so later reports only copy it in. fpdf embeds TrueType
+# fonts as subsets holding just the glyphs a document used.
+#
+# Latin-1 text still goes through plain multi_cell/cell, so such reports
+# render exactly as before. Characters no font covers are transliterated to
+# Latin-1 where possible and printed as "?" otherwise. fpdf 1.7 places glyphs
+# in logical order without OpenType shaping, so conjuncts and reordered vowel
+# signs depend on how much the font itself precomposes.
+
+SCRIPTS = {"sinhala": (0x0D80, 0x0DFF), "tamil": (0x0B80, 0x0BFF)}
+STYLES = {"regular": "", "bold": "B", "italic": "I", "oblique": "I", "bolditalic": "BI", "boldoblique": "BI"}
+CORE_FAMILIES = ("arial", "helvetica", "times", "courier", "symbol", "zapfdingbats")
+# a font "covers" a script when it has glyphs for at least this share of its letters
+SCRIPT_COVERAGE = 0.5
+PUNCTUATION = {
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201c": '"', "\u201d": '"', "\u201e": '"',
+    "\u2013": "-", "\u2014": "-", "\u2026": "...", "\u2022": "*", "\u2009": " ", "\u200b": "",
+    "\u200c": "", "\u200d": "", "\u20ac": "EUR", "\u20a8": "Rs",
+}
+
+_lock = threading.Lock()
+_families = None
+_metrics = {}
+
+
+def is_latin1(text):
+    try:
+        text.encode("latin-1")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def script_of(char):
+    code = ord(char)
+    for name, (first, last) in SCRIPTS.items():
+        if first <= code <= last:
+            return name
+    return None
+
+
+def to_latin1(text):
+    # Best effort for the core fonts: known punctuation, accents stripped,
+    # anything else as "?"
+    out = []
+    for char in text:
+        if ord(char) < 256:
+            out.append(char)
+        elif char in PUNCTUATION:
+            out.append(PUNCTUATION[char])
+        else:
+            base = "".join(c for c in unicodedata.normalize("NFKD", char) if ord(c) < 256 and not unicodedata.combining(c))
+            out.append(base or "?")
+    return "".join(out)
+
+
+# --- FONT DISCOVERY ---
+def _scan(font_dir):
+    # {family: {style: path}} for the .ttf files in font_dir
+    families = {}
+    if not font_dir or not os.path.isdir(font_dir):
+        return families
+    for name in sorted(os.listdir(font_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() != ".ttf":
+            continue
+        family, _, style = stem.rpartition("-")
+        if not family or style.lower() not in STYLES:
+            family, style = stem, "regular"
+        family = family.replace(" ", "").lower()
+        if family in CORE_FAMILIES:
+            family = "ttf" + family
+        families.setdefault(family, {})[STYLES[style.lower()]] = os.path.join(font_dir, name)
+    return families
+
+
+def families():
+    global _families
+    if _families is None:
+        with _lock:
+            if _families is None:
+                _families = _scan(config.FONT_DIR)
+    return _families
+
+
+def _configure_cache():
+    from fpdf import set_global
+
+    os.makedirs(config.FONT_CACHE_DIR, exist_ok=True)
+    set_global("FPDF_CACHE_MODE", 2)
+    set_global("FPDF_CACHE_DIR", config.FONT_CACHE_DIR)
+
+
+def font_metrics(path):
+    # fpdf's parsed font dict for path, parsed (or unpickled) once per process
+    entry = _metrics.get(path)
+    if entry is not None:
+        return entry
+    with _lock:
+        entry = _metrics.get(path)
+        if entry is None:
+            from fpdf import FPDF
+            from fpdf.py3k import hashpath
+
+            _configure_cache()
+            # fpdf keys its pickle by path only; drop it when the font changed
+            pickled = os.path.join(config.FONT_CACHE_DIR, hashpath(path) + ".pkl")
+            if os.path.exists(pickled) and os.path.getmtime(pickled) < os.path.getmtime(path):
+                os.remove(pickled)
+            scratch = FPDF()
+            scratch.add_font("scratch", "", path, uni=True)
+            font = scratch.fonts["scratch"]
+            entry = {
+                "font": {k: v for k, v in font.items() if k not in ("i", "subset", "fontkey")},
+                "length1": scratch.font_files["scratch"]["length1"],
+            }
+            _metrics[path] = entry
+    return entry
+
+
+def warm():
+    # parse (or unpickle) every font's metrics ahead of the first report
+    for family in families():
+        font_metrics(_regular(family))
+
+
+def _regular(family):
+    styles = families()[family]
+    return styles.get("") or next(iter(styles.values()))
+
+
+def _covers(family, char):
+    cw = font_metrics(_regular(family))["font"]["cw"]
+    code = ord(char)
+    return code < len(cw) and cw[code] > 0
+
+
+def _script_family(script):
+    # first family (by name) with glyphs for most of the script's letters;
+    # marks are zero-width and do not count either way
+    first, last = SCRIPTS[script]
+    letters = [chr(c) for c in range(first, last + 1) if unicodedata.category(chr(c)) == "Lo"]
+    for family in families():
+        cw = font_metrics(_regular(family))["font"]["cw"]
+        covered = sum(1 for c in letters if ord(c) < len(cw) and cw[ord(c)] > 0)
+        if letters and covered >= SCRIPT_COVERAGE * len(letters):
+            return family
+    return None
+
+
+_script_families = {}
+
+
+def family_for(char):
+    # TrueType family to write char in, or None when nothing covers it
+    script = script_of(char)
+    if script:
+        if script not in _script_families:
+            _script_families[script] = _script_family(script)
+        return _script_families[script]
+    for family in families():
+        if _covers(family, char):
+            return family
+    return None
+
+
+def use_font(pdf, family, style, size):
+    # set_font for a TrueType family, copying the cached metrics into this
+    # document the first time it is used (what add_font would do, minus the parsing)
+    key = family + style
+    if key not in pdf.fonts:
+        path = families()[family].get(style) or _regular(family)
+        metrics = font_metrics(path)
+        pdf.fonts[key] = dict(
+            metrics["font"], i=len(pdf.fonts) + 1, fontkey=key,
+            subset=list(range(0, 57 if hasattr(pdf, "str_alias_nb_pages") else 32)),
+        )
+        pdf.font_files[key] = {"length1": metrics["length1"], "type": "TTF", "ttffile": path}
+        pdf.font_files[path] = {"type": "TTF"}
+    pdf.set_font(family, style, size)
+
+
+# --- TEXT RUNS ---
+def runs(text):
+    # [(family or None, text)]: None runs are for the core font. Latin-1
+    # characters stay in a TrueType run when its font has them, so spaces
+    # and digits between Sinhala words do not switch fonts.
+    result = []
+    family, chars = None, []
+    for char in text:
+        if ord(char) < 256:
+            target = family if family and (char in " \n" or _covers(family, char)) else None
+        else:
+            target = family_for(char)
+            if target is None:
+                char = to_latin1(char)
+        if target != family and chars:
+            result.append((family, "".join(chars)))
+            chars = []
+        family = target
+        chars.append(char)
+    if chars:
+        result.append((family, "".join(chars)))
+    return result
+
+
+def _write_runs(pdf, h, parts):
+    core = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+    for family, text in parts:
+        if family:
+            use_font(pdf, family, core[1], core[2])
+        else:
+            pdf.set_font(*core)
+        pdf.write(h, text)
+    pdf.set_font(*core)
+
+
+def multi_text(pdf, h, text):
+    # pdf.multi_cell(0, h, text) for any text; mixed-script paragraphs are
+    # written run by run (left aligned) and end on a new line like multi_cell
+    if is_latin1(text):
+        pdf.multi_cell(0, h, text)
+        return
+    parts = runs(text)
+    if all(family is None for family, _ in parts):
+        pdf.multi_cell(0, h, "".join(t for _, t in parts))
+        return
+    _write_runs(pdf, h, parts)
+    pdf.ln(h)
+
+
+def cell_text(pdf, w, h, text, border=0, ln=0, align="", fill=False):
+    # pdf.cell for any text: the frame is drawn as one cell, the runs are
+    # placed inside it according to align
+    if is_latin1(text):
+        pdf.cell(w, h, text, border, ln, align, fill)
+        return
+    parts = runs(text)
+    if all(family is None for family, _ in parts):
+        pdf.cell(w, h, "".join(t for _, t in parts), border, ln, align, fill)
+        return
+    x, y = pdf.x, pdf.y
+    if w == 0:
+        w = pdf.w - pdf.r_margin - x
+    pdf.cell(w, h, "", border, 0, "", fill)
+    core = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+    widths = []
+    for family, run in parts:
+        if family:
+            use_font(pdf, family, core[1], core[2])
+        else:
+            pdf.set_font(*core)
+        widths.append(pdf.get_string_width(run))
+    offset = pdf.c_margin
+    if align == "R":
+        offset = w - pdf.c_margin - sum(widths)
+    elif align == "C":
+        offset = (w - sum(widths)) / 2
+    pdf.set_xy(x + offset, y)
+    for (family, run), width in zip(parts, widths):
+        if family:
+            use_font(pdf, family, core[1], core[2])
+        else:
+            pdf.set_font(*core)
+        pdf.cell(width, h, run, 0, 0, "", False)
+    pdf.set_font(*core)
+    pdf.set_xy(x, y)
+    pdf.cell(w, h, "", 0, ln)
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from propiq import config, metrics
+
+# --- SECTION FRAGMENT CACHE ---
+# A report section is rendered once into FPDF's page buffers and the output
+# it appended is kept as a fragment: the content added to the page it started
+# on, any whole pages it created, the fonts/images it registered and the
+# writer state it finished in. A fragment is only valid for the same inputs
+# *and* the same starting state (position on the page, current font and
+# colours, registered fonts/images), so all of that goes into the key. When
+# an earlier section grows or shrinks, the sections after it start somewhere
+# else, miss the cache and are rendered again; otherwise they are replayed.
+#
+# TrueType fonts (propiq.fonts) are embedded as subsets of the characters a
+# document used, so a fragment also records the characters it wrote in each
+# of them and a replay adds those to the document's subsets.
+
+# FPDF writer state a section can depend on or change
+STATE_ATTRS = (
+    "x", "y", "lasth", "font_family", "font_style", "font_size_pt", "font_size",
+    "underline", "draw_color", "fill_color", "text_color", "color_flag", "ws", "line_width", "unifontsubset",
+)
+
+
+class FragmentCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or config.FRAGMENT_CACHE_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def put(self, key, fragment):
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+fragment_cache = FragmentCache()
+
+
+def supports_fragments(pdf):
+    # PyFPDF keeps each page as a string in pdf.pages; other writers render
+    # directly without caching.
+    return isinstance(getattr(pdf, "pages", None), dict) and hasattr(pdf, "font_size_pt") and pdf.page > 0
+
+
+def _state(pdf):
+    return tuple(getattr(pdf, a) for a in STATE_ATTRS)
+
+
+def _registry(pdf):
+    return (
+        tuple(sorted((k, v["i"]) for k, v in pdf.fonts.items())),
+        tuple(sorted((k, v["i"]) for k, v in pdf.images.items())),
+    )
+
+
+def _font_copy(font):
+    # fpdf edits a TrueType font's subset list while writing the document
+    font = dict(font)
+    if "subset" in font:
+        font["subset"] = list(font["subset"])
+    return font
+
+
+def _add_chars(subset, chars):
+    have = set(subset)
+    subset.extend(c for c in dict.fromkeys(chars) if c not in have)
+
+
+def render_section(pdf, cache, name, render, *inputs):
+    # Runs render(pdf, *inputs), or replays its cached output.
+    if cache is None or not supports_fragments(pdf):
+        render(pdf, *inputs)
+        return
+    key = hashlib.sha256(repr((name, inputs, _state(pdf), _registry(pdf))).encode("utf-8")).hexdigest()
+    fragment = cache.get(key)
+    metrics.count("fragment.miss" if fragment is None else "fragment.hit")
+    if fragment is None:
+        start_page, start_len = pdf.page, len(pdf.pages[pdf.page])
+        fonts, images, font_files = set(pdf.fonts), set(pdf.images), set(pdf.font_files)
+        # collect what this section writes in already registered TrueType
+        # fonts separately, then merge it back into the document's subsets
+        subsets = {k: f["subset"] for k, f in pdf.fonts.items() if "subset" in f}
+        for k in subsets:
+            pdf.fonts[k]["subset"] = []
+        try:
+            render(pdf, *inputs)
+        finally:
+            used = {k: pdf.fonts[k]["subset"] for k in subsets}
+            for k, subset in subsets.items():
+                _add_chars(subset, used[k])
+                pdf.fonts[k]["subset"] = subset
+        cache.put(key, {
+            "head": pdf.pages[start_page][start_len:],
+            "pages": [pdf.pages[p] for p in range(start_page + 1, pdf.page + 1)],
+            "fonts": {k: _font_copy(v) for k, v in pdf.fonts.items() if k not in fonts},
+            "font_files": {k: dict(v) for k, v in pdf.font_files.items() if k not in font_files},
+            "subsets": {k: list(dict.fromkeys(v)) for k, v in used.items() if v},
+            "images": {k: dict(v) for k, v in pdf.images.items() if k not in images},
+            "state": _state(pdf),
+        })
+        return
+    pdf.fonts.update({k: _font_copy(v) for k, v in fragment["fonts"].items()})
+    pdf.font_files.update({k: dict(v) for k, v in fragment["font_files"].items()})
+    for k, chars in fragment["subsets"].items():
+        _add_chars(pdf.fonts[k]["subset"], chars)
+    # FPDF drops image data on output, so every document gets its own copy
+    pdf.images.update({k: dict(v) for k, v in fragment["images"].items()})
+    pdf.pages[pdf.page] += fragment["head"]
+    for content in fragment["pages"]:
+        pdf.page += 1
+        pdf.pages[pdf.page] = content
+    for attr, value in zip(STATE_ATTRS, fragment["state"]):
+        setattr(pdf, attr, value)
+    pdf.current_font = pdf.fonts[pdf.font_family + pdf.font_style] if pdf.font_family else {}
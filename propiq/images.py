@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+import time
+
+from propiq import config
+
+
+# --- IMAGE INGESTION ---
+# Every uploaded photo is decoded once, rotated according to its EXIF
+# orientation, downsampled to the pixels actually needed at print size and
+# re-encoded as JPEG. Results live in a content-addressed cache directory so
+# reruns and report regenerations reuse them instead of reprocessing.
+
+class InvalidImage(ValueError):
+    pass
+
+
+def target_width_px(width_mm=None, dpi=None):
+    width_mm = width_mm or config.IMAGE_WIDTH_MM
+    dpi = dpi or config.IMAGE_DPI
+    return int(round(width_mm / 25.4 * dpi))
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _encode(data, max_px, quality):
+    from PIL import Image, ImageOps
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        # let the JPEG decoder scale down while decoding (much faster than a full decode)
+        img.draft("RGB", (max_px, max_px))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        # not an image, truncated, or too many pixels to decode safely
+        raise InvalidImage(str(e) or type(e).__name__) from e
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.width > max_px:
+        img = img.resize((max_px, max(1, round(img.height * max_px / img.width))), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def ingest_image(data, digest=None, width_mm=None, dpi=None, quality=None, cache_dir=None):
+    # Returns a dict describing the cached, print-ready JPEG:
+    # {"path", "hash", "original_bytes", "bytes", "seconds", "cached"}
+    start = time.perf_counter()
+    max_px = target_width_px(width_mm, dpi)
+    quality = quality or config.IMAGE_QUALITY
+    cache_dir = cache_dir or config.IMAGE_CACHE_DIR
+    digest = digest or content_hash(data)
+    path = os.path.join(cache_dir, f"{digest[:40]}-{max_px}px-q{quality}.jpg")
+
+    cached = os.path.exists(path)
+    if not cached:
+        encoded = _encode(data, max_px, quality)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp, path)
+        prune_cache(cache_dir)
+    return {
+        "path": path,
+        "hash": digest,
+        "original_bytes": len(data),
+        "bytes": os.path.getsize(path),
+        "seconds": time.perf_counter() - start,
+        "cached": cached,
+    }
+
+
+def prune_cache(cache_dir=None, max_mb=None):
+    # Drop the least recently written files once the cache exceeds its budget.
+    cache_dir = cache_dir or config.IMAGE_CACHE_DIR
+    budget = (max_mb or config.IMAGE_CACHE_MAX_MB) * 1024 * 1024
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def summarize(results):
+    # Before/after totals for a list of ingest_image() results.
+    original = sum(r["original_bytes"] for r in results)
+    stored = sum(r["bytes"] for r in results)
+    return {
+        "images": len(results),
+        "original_bytes": original,
+        "bytes": stored,
+        "saved_pct": (1 - stored / original) * 100 if original else 0.0,
+        "seconds": sum(r["seconds"] for r in results),
+        "cache_hits": sum(1 for r in results if r["cached"]),
+    }
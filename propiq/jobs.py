@@ -0,0 +1,82 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from propiq import config
+
+
+class QueueFull(Exception):
+    pass
+
+
+# --- REPORT JOB QUEUE ---
+# Report generation runs on a small worker pool so the Streamlit script
+# thread only submits a job and polls its status. Finished jobs (and their
+# PDF bytes) are kept for a TTL; submitting the same key again while a job
+# is still around returns the existing job instead of regenerating.
+class JobQueue:
+    def __init__(self, workers=None, max_pending=None, ttl_seconds=None):
+        self.max_pending = max_pending or config.JOB_MAX_PENDING
+        self.ttl_seconds = ttl_seconds or config.JOB_TTL_SECONDS
+        self._pool = ThreadPoolExecutor(max_workers=workers or config.JOB_WORKERS, thread_name_prefix="propiq-report")
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, key=None, **kwargs):
+        # fn is called as fn(*args, progress=callback, **kwargs)
+        with self._lock:
+            self._expire()
+            if key is not None and key in self._by_key:
+                existing = self._jobs[self._by_key[key]]
+                if existing["state"] != "failed":
+                    return existing["id"]
+            active = sum(1 for j in self._jobs.values() if j["state"] in ("queued", "running"))
+            if active >= self.max_pending:
+                raise QueueFull(f"{active} reports are already queued")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id, "key": key, "state": "queued", "stage": "queued", "progress": 0.0,
+                "result": None, "error": None, "created": time.time(), "finished": None,
+            }
+            if key is not None:
+                self._by_key[key] = job_id
+        self._pool.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, fn, args, kwargs):
+        job = self._jobs[job_id]
+
+        def progress(stage, fraction):
+            job["stage"], job["progress"] = stage, fraction
+
+        job["state"] = "running"
+        try:
+            job["result"] = fn(*args, progress=progress, **kwargs)
+            job["state"], job["stage"], job["progress"] = "done", "done", 1.0
+        except Exception as e:
+            job["state"], job["error"] = "failed", f"{type(e).__name__}: {e}"
+        job["finished"] = time.time()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [j["id"] for j in self._jobs.values() if j["finished"] and j["finished"] < cutoff]:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job["key"]) == job_id:
+                del self._by_key[job["key"]]
+
+    def status(self, job_id, with_result=False):
+        # Snapshot (with the result payload only when asked for); None once
+        # the job has expired. One locked read, so a finished job's state and
+        # result always come together.
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return dict(job) if with_result else {k: v for k, v in job.items() if k != "result"}
+
+    def depth(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["state"] in ("queued", "running"))
@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from propiq import config
+
+# --- STAGE METRICS ---
+# Opt-in timings for the slow parts of a rerun and of report generation.
+#
+#   with metrics.timer("pdf_output"):
+#       ...
+#
+# Disabled (the default), timer() hands back one shared no-op object, so an
+# instrumented block costs a function call and two empty method calls. Enabled
+# (PROPIQ_METRICS=1), each finished stage is appended as a JSON line to
+# METRICS_LOG, kept in a bounded window per stage for p50/p95, and summarised
+# in Prometheus text format in METRICS_FILE (and on METRICS_PORT if set).
+
+WINDOW = 1000
+FLUSH_SECONDS = 5.0
+
+enabled = config.METRICS
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_log = None
+_last_flush = 0.0
+_server = None
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def start(self):
+        return self
+
+    def stop(self):
+        return 0.0
+
+
+_NOOP = _NoopTimer()
+
+
+class _Timer:
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+        self._t0 = self._cpu0 = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop(error=exc_type.__name__ if exc_type else None)
+        return False
+
+    def start(self):
+        self._t0, self._cpu0 = time.perf_counter(), time.thread_time()
+        return self
+
+    def stop(self, error=None):
+        if self._t0 is None:
+            return 0.0
+        seconds = time.perf_counter() - self._t0
+        cpu = time.thread_time() - self._cpu0
+        self._t0 = None
+        record(self.stage, seconds, cpu=cpu, error=error, **self.fields)
+        return seconds
+
+
+def timer(stage, **fields):
+    # fields are extra context for the log line (section name, bytes, ...)
+    if not enabled:
+        return _NOOP
+    return _Timer(stage, fields)
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def record(stage, seconds, cpu=None, error=None, **fields):
+    if not enabled:
+        return
+    with _lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = {"window": deque(maxlen=WINDOW), "count": 0, "sum": 0.0, "errors": 0}
+        entry["window"].append(seconds)
+        entry["count"] += 1
+        entry["sum"] += seconds
+        if error:
+            entry["errors"] += 1
+        line = {"ts": round(time.time(), 3), "stage": stage, "seconds": round(seconds, 6)}
+        if cpu is not None:
+            line["cpu_seconds"] = round(cpu, 6)
+        if error:
+            line["error"] = error
+        line.update(fields)
+        _write_log(line)
+    _maybe_flush()
+
+
+def _write_log(line):
+    global _log
+    if _log is None:
+        folder = os.path.dirname(config.METRICS_LOG)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        _log = open(config.METRICS_LOG, "a", encoding="utf-8", buffering=1)
+    _log.write(json.dumps(line, default=str) + "\n")
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary():
+    # {stage: {"count", "sum", "errors", "p50", "p95"}} over the last WINDOW samples
+    with _lock:
+        stages = {name: (sorted(e["window"]), e["count"], e["sum"], e["errors"]) for name, e in _stages.items()}
+        counters = dict(_counters)
+    result = {}
+    for name, (ordered, n, total, errors) in stages.items():
+        result[name] = {"count": n, "sum": total, "errors": errors,
+                        "p50": _quantile(ordered, 0.5), "p95": _quantile(ordered, 0.95)}
+    return result, counters
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def prometheus_text():
+    stages, counters = summary()
+    lines = [
+        "# HELP propiq_stage_seconds Wall time per stage (quantiles over the last %d samples)." % WINDOW,
+        "# TYPE propiq_stage_seconds summary",
+    ]
+    for name in sorted(stages):
+        s, label = stages[name], _label(name)
+        lines.append(f'propiq_stage_seconds{{stage="{label}",quantile="0.5"}} {s["p50"]:.6f}')
+        lines.append(f'propiq_stage_seconds{{stage="{label}",quantile="0.95"}} {s["p95"]:.6f}')
+        lines.append(f'propiq_stage_seconds_sum{{stage="{label}"}} {s["sum"]:.6f}')
+        lines.append(f'propiq_stage_seconds_count{{stage="{label}"}} {s["count"]}')
+    lines += ["# HELP propiq_stage_errors_total Stages that raised.", "# TYPE propiq_stage_errors_total counter"]
+    for name in sorted(stages):
+        lines.append(f'propiq_stage_errors_total{{stage="{_label(name)}"}} {stages[name]["errors"]}')
+    lines += ["# HELP propiq_events_total Event counters.", "# TYPE propiq_events_total counter"]
+    for name in sorted(counters):
+        lines.append(f'propiq_events_total{{event="{_label(name)}"}} {counters[name]}')
+    return "\n".join(lines) + "\n"
+
+
+def flush():
+    # Rewrites METRICS_FILE atomically so a scraper never reads half a file.
+    if not enabled:
+        return
+    folder = os.path.dirname(config.METRICS_FILE)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp = f"{config.METRICS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, config.METRICS_FILE)
+
+
+def _maybe_flush():
+    global _last_flush
+    now = time.monotonic()
+    if now - _last_flush < FLUSH_SECONDS:
+        return
+    _last_flush = now
+    flush()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=None):
+    # Starts the /metrics endpoint once per process; a no-op when disabled or
+    # when no port is configured.
+    global _server
+    port = port or config.METRICS_PORT
+    if not enabled or not port:
+        return None
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+            except OSError:
+                # another process (e.g. a second worker) already serves it
+                return None
+            threading.Thread(target=_server.serve_forever, name="propiq-metrics", daemon=True).start()
+    return _server
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
@@ -0,0 +1,82 @@
+import html
+import os
+
+from propiq.comparables import EVIDENCE_COLUMNS
+from propiq.images import ingest_image
+from propiq.report import BUILDING_TEXT, LAND_TEXT, TEMPLATE, certificate_text, date_str
+
+# --- QUICK PREVIEW ---
+# An HTML rendering of the report straight from TEMPLATE and the form fields.
+# It follows the same section order as generate_pdf but needs no PDF, so it
+# stays a few KB however many photos are attached. Photos are not inlined;
+# the app shows small thumbnails on request.
+
+THUMBNAIL_WIDTH_MM = 40
+
+
+def _value(value):
+    if isinstance(value, list):
+        value = ", ".join(value)
+    if not value:
+        return '<p class="preview-na">N/A</p>'
+    # st.markdown ends an HTML block at a blank line, so the user's line
+    # breaks become <br> and the markup itself never contains a newline
+    text = html.escape(str(value)).replace("\r\n", "\n").replace("\n", "<br>")
+    return f'<p class="preview-value">{text}</p>'
+
+
+def _section(title, template_text, value=None, show_value=True):
+    paragraphs = "".join(
+        f'<p class="preview-template">{html.escape(line.strip())}</p>'
+        for line in template_text.split("\n") if line.strip()
+    )
+    return f'<h4>{html.escape(title)}</h4>{paragraphs}{_value(value) if show_value else ""}'
+
+
+def _row(values, tag="td"):
+    return "<tr>" + "".join(f"<{tag}>{html.escape(str(v))}</{tag}>" for v in values) + "</tr>"
+
+
+def _table(rows, header=None):
+    if not rows:
+        return ""
+    head = _row(header, "th") if header else ""
+    body = "".join(_row(row) for row in rows)
+    return f'<table class="preview-table">{head}{body}</table>'
+
+
+def render_preview_html(data_dict):
+    images = data_dict.get("r) Property Images") or []
+    parts = [
+        '<div class="preview">',
+        '<h3>VALUATION REPORT</h3>',
+        f'<p class="preview-amount">{html.escape(str(data_dict.get("l) Amount of valuation") or "LKR. ___________"))}</p>',
+        _section("01.0 PURPOSE OF VALUATION", TEMPLATE["01.0 PURPOSE OF VALUATION"], data_dict.get("c) Purpose of the valuation")),
+        _section("02.0 DATE OF INSPECTION", TEMPLATE["02.0 DATE OF INSPECTION"], date_str(data_dict.get("f) Valuation date"))),
+        _section("03.0 IDENTIFICATION OF PROPERTY", TEMPLATE["03.0 IDENTIFICATION OF PROPERTY"], data_dict.get("d) Identification of the property")),
+        _section("04.0 NATURE OF PROPERTY", TEMPLATE["04.0 NATURE OF PROPERTY"], data_dict.get("g) Nature of the property")),
+        _section("05.0 SITE PROFILE", LAND_TEXT, data_dict.get("h) Site profile")),
+        _section("05.2 BUILDING", BUILDING_TEXT, show_value=False),
+        f'<p class="preview-template">{len(images)} photo(s): {html.escape(", ".join(img["part"] for img in images)) or "none"}</p>',
+        _section("06.0 EVIDENCE OF MARKET VALUES", TEMPLATE["06.0 EVIDENCE OF MARKET VALUES"], data_dict.get("i) Market value evidence")),
+        _table(data_dict.get("o) Comparable sales"), EVIDENCE_COLUMNS),
+        _section("07.0 ASSUMPTION AND RESERVATION", TEMPLATE["07.0 ASSUMPTION AND RESERVATION"], data_dict.get("j) Assumptions and reservations")),
+        _section("08.0 BASIS OF VALUATION", TEMPLATE["08.0 BASIS OF VALUATION"], data_dict.get("e) Basis of value adopted")),
+        _section("09.0 VALUATION APPROACH AND REASONING", TEMPLATE["09.0 VALUATION APPROACH AND REASONING"], data_dict.get("k) Valuation approach")),
+        _table(data_dict.get("n) Valuation calculation")),
+        _section("10.0 CERTIFICATE", certificate_text(
+            data_dict.get("a) Identification and status of the valuer", "__________"),
+            date_str(data_dict.get("m) Date of the valuation report")) or "__________",
+        ), show_value=False),
+        "</div>",
+    ]
+    return "".join(parts)
+
+
+def thumbnail(path):
+    # Small JPEG for the preview, produced by (and cached in) the ingestion
+    # pipeline like the print-size images.
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return ingest_image(f.read(), width_mm=THUMBNAIL_WIDTH_MM)["path"]
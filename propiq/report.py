@@ -0,0 +1,321 @@
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+
+from propiq import fonts, metrics
+from propiq.assets import get_logo, place_image
+from propiq.comparables import EVIDENCE_COLUMNS
+from propiq.fragments import fragment_cache, render_section
+
+
+# --- PDF CLASS ---
+# fpdf is imported on first use so that importing this module (and every
+# Streamlit rerun that does) stays cheap.
+_PDF = None
+
+
+def pdf_class():
+    global _PDF
+    if _PDF is None:
+        from fpdf import FPDF
+
+        class PDF(FPDF):
+            def header(self):
+                self.set_fill_color(128, 0, 0)
+                self.rect(0, 0, 210, 20, 'F')
+                self.set_text_color(255, 215, 0)
+                self.set_font('Arial', 'B', 16)
+                self.cell(0, 10, "PROPIQ | University of Sri Jayewardenepura", ln=True, align='C')
+                self.ln(10)
+
+            def footer(self):
+                self.set_y(-15)
+                self.set_text_color(128, 0, 0)
+                self.set_font('Arial', 'I', 10)
+                self.cell(0, 10, "Generated by PROPIQ | USJP", 0, 0, 'C')
+
+        _PDF = PDF
+    return _PDF
+
+
+def load_resources():
+    # Warm the process-wide objects (FPDF class, parsed logo) ahead of the
+    # first report; the Streamlit app holds the result in st.cache_resource.
+    pdf_class()
+    get_logo()
+    fonts.warm()
+    return TEMPLATE
+
+
+# --- Helper to print a template paragraph and then the user's input in bold (if provided) ---
+def add_template_paragraph(pdf, template_text, input_text=None):
+    pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Arial", "", 11)
+    # print the template explanatory text
+    for line in template_text.split("\n"):
+        fonts.multi_text(pdf, 6, line.strip())
+    pdf.ln(2)
+    # print the user input as bold (if provided)
+    if input_text:
+        pdf.set_font("Arial", "B", 11)
+        # if the input is a list (e.g., selected parts), join them
+        if isinstance(input_text, list):
+            input_text_str = ", ".join(input_text) if input_text else "N/A"
+        else:
+            input_text_str = str(input_text)
+        fonts.multi_text(pdf, 6, input_text_str)
+        pdf.ln(4)
+    else:
+        pdf.set_font("Arial", "I", 10)
+        pdf.multi_cell(0, 6, "N/A")
+        pdf.ln(4)
+    # reset normal font
+    pdf.set_font("Arial", "", 11)
+
+
+# --- Template paragraphs (taken / paraphrased from your uploaded template) ---
+TEMPLATE = {
+    "01.0 PURPOSE OF VALUATION": """The purpose of this valuation is to determine the Market Value of the subject property for the intended purpose as described below.""",
+    "02.0 DATE OF INSPECTION": """I inspected the subject property on the date noted below in the presence of the agent of the applicant. The date of inspection is generally accepted as the date of valuation.""",
+    "03.0 IDENTIFICATION OF PROPERTY": """Explain how you identify the property. Includes boundary demarcation/plan and deed particulars. It is ideal to give reference to the survey plan details including the plan number, name of the land, name of the surveyor and the date of the survey plan. Indicate assessment number and postal address wherever applicable.""",
+    "04.0 NATURE OF PROPERTY": """Explain the use of the property and occupancy: e.g., owner-occupied residential, commercial or industrial property. Whenever the occupant is not the owner of the property, the status of the occupancy and relationship between owner and occupant should be explained.""",
+    "05.0 SITE PROFILE": """06.1 LAND - Explain the geographical features of the land such as shape, terrain, topography, soil condition, elevation, plantation, etc.\n\n06.2 BUILDING - Describe the building. Generally, this explanation should start from the top of the building (Roof) to the bottom (Foundation). All internal and external features including conveniences should be explained. The floor area of different constructions/ different ages have to be declared. It is recommended to add a pictorial view of the different sections/parts of the building with a small description.""",
+    "06.0 EVIDENCE OF MARKET VALUES": """Details of evidence on land values and rentals as well as cost information should be given here. The types of data needed must be collected from reliable sources both private and public and recorded for future use, and the accuracy of data must be verified.""",
+    "07.0 ASSUMPTION AND RESERVATION": """Assumptions and any special assumptions should be clearly stated. The Assumption is made that a specific investigation by the valuer is not required to prove that something is true. Special Assumptions are those things that are not true but have been assumed to be true.""",
+    "08.0 BASIS OF VALUATION": """This explains the meaning of the value figure reported. Examples: Market Value, Forced Sale Value, Insurance Value. The following definitions (derived from IVS) have been used.""",
+    "09.0 VALUATION APPROACH AND REASONING": """Explain the selected valuation approach and reasoning. This may be the Market approach, Income approach, or Cost approach. The valuation techniques used, and any adjustments should be stated.""",
+    "10.0 CERTIFICATE": """Prepared by the valuer. The valuation was done according to the standards. This report is confidential to the client and is not allowed to be used by any other party for any other purpose. The validity period of this report is as stated below.""",
+}
+
+# Explanatory text printed under 05.0 (the PDF uses these rather than TEMPLATE["05.0 SITE PROFILE"])
+LAND_TEXT = "05.1 LAND\n" + "Explain the geographical features of the land (shape, terrain, topography, soil condition, elevation, plantation, etc.)."
+BUILDING_TEXT = "Describe the building (roof to foundation), internal/external features and floor area. A pictorial view is recommended below."
+
+
+# Helper to write a section heading
+def write_section_heading(pdf, title):
+    pdf.set_text_color(128, 0, 0)
+    pdf.set_font("Arial", "B", 13)
+    pdf.multi_cell(0, 8, title)
+    pdf.ln(2)
+
+
+def new_report_id():
+    # The timestamp alone collides when two reports start in the same second
+    # (batch runs, concurrent sessions); 48 random bits per second make a
+    # collision practically impossible at batch scale while the ID still
+    # fits on one line of the cover.
+    return datetime.now().strftime("PROPIQ-%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:12].upper()
+
+
+def fields_digest(data_dict):
+    # Stable hash of the form inputs. Image paths are content-hash names, so
+    # a changed photo changes the digest too.
+    payload = json.dumps(data_dict, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- REPORT SECTIONS ---
+# Each section only reads its arguments, so its rendered output can be cached
+# as a fragment (see propiq.fragments) keyed by those arguments.
+def _text_section(pdf, title, template_text, input_text):
+    write_section_heading(pdf, title)
+    add_template_paragraph(pdf, template_text, input_text)
+
+
+# 06.0 comparables table column widths (mm, 190 in all)
+EVIDENCE_WIDTHS = (22, 52, 28, 20, 38, 30)
+
+
+def _fit(pdf, text, width):
+    # text shortened with "..." to fit a cell of `width` mm in the current
+    # font; text outside Latin-1 is measured per run by fonts.cell_text, so
+    # it is only cut by length
+    if not fonts.is_latin1(text):
+        return text if len(text) <= width // 2 else text[:width // 2 - 1] + "..."
+    limit = width - 2 * pdf.c_margin
+    if pdf.get_string_width(text) <= limit:
+        return text
+    while text and pdf.get_string_width(text + "...") > limit:
+        text = text[:-1]
+    return text + "..."
+
+
+def _evidence_section(pdf, template_text, evidence, comparables):
+    write_section_heading(pdf, "06.0 EVIDENCE OF MARKET VALUES")
+    add_template_paragraph(pdf, template_text, evidence)
+    # comparable sales picked in the app, if any
+    if comparables:
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Arial", "B", 9)
+        for width, title in zip(EVIDENCE_WIDTHS, EVIDENCE_COLUMNS):
+            pdf.cell(width, 7, title, border=1, align="C")
+        pdf.ln(7)
+        pdf.set_font("Arial", "", 9)
+        for row in comparables:
+            for i, (width, value) in enumerate(zip(EVIDENCE_WIDTHS, row)):
+                fonts.cell_text(pdf, width, 7, _fit(pdf, str(value), width), border=1, align="R" if i >= 3 else "")
+            pdf.ln(7)
+        pdf.ln(4)
+        pdf.set_font("Arial", "", 11)
+
+
+def _valuation_section(pdf, template_text, approach, calculation):
+    write_section_heading(pdf, "09.0 VALUATION APPROACH AND REASONING")
+    add_template_paragraph(pdf, template_text, approach)
+    # calculation table from the valuation calculator, if one was used
+    if calculation:
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Arial", "", 10)
+        for label, value in calculation:
+            fonts.cell_text(pdf, 120, 7, str(label), border=1)
+            fonts.cell_text(pdf, 0, 7, str(value), border=1, ln=1, align="R")
+        pdf.ln(4)
+        pdf.set_font("Arial", "", 11)
+
+
+def _cover(pdf, logo_path, amount):
+    # --- University Logo (top center) ---
+    if logo_path:
+        place_image(pdf, logo_path, x=85, y=25, w=40)
+
+    pdf.ln(60)
+    pdf.set_font("Arial", "B", 20)
+    pdf.set_text_color(128, 0, 0)
+    pdf.cell(0, 15, "VALUATION REPORT", ln=True, align="C")
+    pdf.ln(10)
+
+    pdf.set_font("Arial", "B", 16)
+    fonts.cell_text(pdf, 0, 10, f"{amount}", ln=True, align="C")
+    pdf.set_font("Arial", "I", 12)
+    pdf.cell(0, 10, "The term of currency is Sri Lankan Rupees", ln=True, align="C")
+    pdf.ln(15)
+
+
+def _cover_image(pdf, path):
+    # main cover image (if available)
+    try:
+        if os.path.exists(path):
+            place_image(pdf, path, x=25, y=None, w=160)
+    except Exception:
+        # if image fails, continue gracefully
+        pass
+
+
+def _site_profile(pdf, land):
+    write_section_heading(pdf, "05.0 SITE PROFILE")
+    # 05.1 LAND
+    add_template_paragraph(pdf, LAND_TEXT, land)
+    # 05.2 BUILDING
+    write_section_heading(pdf, "05.2 BUILDING")
+    add_template_paragraph(pdf, BUILDING_TEXT, None)
+
+
+def _image_gallery(pdf, images):
+    # Insert property images for parts (after heading)
+    for part, path in images:
+        try:
+            pdf.set_font("Arial", "I", 11)
+            fonts.multi_text(pdf, 6, f"{part}:")
+            # insert image and keep width consistent
+            if os.path.exists(path):
+                with metrics.timer("pdf.image", part=part):
+                    place_image(pdf, path, x=25, y=None, w=160)
+            pdf.ln(4)
+        except Exception:
+            # ignore individual image errors
+            pass
+
+
+def certificate_text(valuer_name, date_of_report_str):
+    # We'll include the prepared-by block using the valuer name and report date
+    certificate_paragraph = TEMPLATE["10.0 CERTIFICATE"] + "\n\n" + \
+                            "Yours Sincerely,\n\n" + \
+                            "{valuer_name}\nChartered Valuation Surveyor\n\n" + \
+                            "Date of Report: {date_of_report}\n\nDISCLAIMER:\nThis template is intended as a general framework only..."
+    return certificate_paragraph.format(valuer_name=valuer_name, date_of_report=date_of_report_str)
+
+
+def _certificate(pdf, valuer_name, date_of_report_str):
+    write_section_heading(pdf, "10.0 CERTIFICATE")
+    # print certificate paragraph template (explanatory)
+    add_template_paragraph(pdf, certificate_text(valuer_name, date_of_report_str), None)
+
+
+def date_str(value):
+    return value.strftime("%Y-%m-%d") if value else None
+
+
+# --- PDF GENERATION FUNCTION ---
+# progress(stage, fraction) is called as the report moves through "cover",
+# "sections", "images" and "finalise". Unchanged sections are replayed from
+# `cache` (the process-wide fragment cache by default; None disables it).
+def generate_pdf(data_dict, dest="F", report_id=None, progress=None, cache=fragment_cache):
+    progress = progress or (lambda stage, fraction: None)
+    report_id = report_id or new_report_id()
+    images = [(img["part"], img["path"]) for img in data_dict.get("r) Property Images") or []]
+
+    def section(name, render, *inputs):
+        with metrics.timer(f"pdf.section.{name}"):
+            render_section(pdf, cache, name, render, *inputs)
+
+    total = metrics.timer("pdf.total", report_id=report_id).start()
+    progress("cover", 0.0)
+    pdf = pdf_class()()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    # --- COVER PAGE ---
+    pdf.add_page()
+    logo = get_logo()
+    section("cover", _cover, logo["path"] if logo else None, data_dict.get("l) Amount of valuation", "LKR. ___________"))
+    # the reference number is unique per report, so it is never cached
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(0, 10, f"Reference Number of the Report: {report_id}", ln=True, align="C")
+    pdf.ln(15)
+    if images:
+        section("cover image", _cover_image, images[0][1])
+
+    # --- Add rest of report pages based on template structure ---
+    pdf.add_page()
+
+    progress("sections", 0.2)
+    section("01.0", _text_section, "01.0 PURPOSE OF VALUATION", TEMPLATE["01.0 PURPOSE OF VALUATION"], data_dict.get("c) Purpose of the valuation"))
+    section("02.0", _text_section, "02.0 DATE OF INSPECTION", TEMPLATE["02.0 DATE OF INSPECTION"], date_str(data_dict.get("f) Valuation date")))
+    section("03.0", _text_section, "03.0 IDENTIFICATION OF PROPERTY", TEMPLATE["03.0 IDENTIFICATION OF PROPERTY"], data_dict.get("d) Identification of the property"))
+    section("04.0", _text_section, "04.0 NATURE OF PROPERTY", TEMPLATE["04.0 NATURE OF PROPERTY"], data_dict.get("g) Nature of the property"))
+    section("05.0", _site_profile, data_dict.get("h) Site profile"))
+
+    progress("images", 0.4)
+    section("05.2 images", _image_gallery, images)
+
+    progress("sections", 0.7)
+    section("06.0", _evidence_section, TEMPLATE["06.0 EVIDENCE OF MARKET VALUES"], data_dict.get("i) Market value evidence"),
+            data_dict.get("o) Comparable sales"))
+    section("07.0", _text_section, "07.0 ASSUMPTION AND RESERVATION", TEMPLATE["07.0 ASSUMPTION AND RESERVATION"], data_dict.get("j) Assumptions and reservations"))
+    section("08.0", _text_section, "08.0 BASIS OF VALUATION", TEMPLATE["08.0 BASIS OF VALUATION"], data_dict.get("e) Basis of value adopted"))
+    section("09.0", _valuation_section, TEMPLATE["09.0 VALUATION APPROACH AND REASONING"], data_dict.get("k) Valuation approach"),
+            data_dict.get("n) Valuation calculation"))
+    section("10.0", _certificate,
+            data_dict.get("a) Identification and status of the valuer", "__________"),
+            date_str(data_dict.get("m) Date of the valuation report")) or "__________")
+
+    # Finally generated info and signature
+    pdf.ln(6)
+    pdf.set_text_color(128, 0, 0)
+    pdf.set_font("Arial", "B", 11)
+    pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align="R")
+
+    # Output file (dest="S" keeps the PDF in memory and returns its bytes too)
+    progress("finalise", 0.9)
+    filename = f"valuation_report_{report_id}.pdf"
+    with metrics.timer("pdf.output"):
+        if dest == "S":
+            out = pdf.output(dest="S")
+            result = filename, out.encode("latin-1") if isinstance(out, str) else bytes(out)
+        else:
+            pdf.output(filename)
+            result = filename
+    total.stop()
+    return result
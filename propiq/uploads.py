@@ -0,0 +1,99 @@
+import os
+import shutil
+import time
+import uuid
+import weakref
+
+from propiq import config, metrics
+from propiq.images import InvalidImage, ingest_image
+
+
+# --- SESSION UPLOAD STORE ---
+# Streamlit re-runs the whole script on every widget interaction, so the
+# uploaders hand us the same files again and again. Each session keeps its
+# own directory of processed images keyed by uploader slot; a file is read,
+# ingested and linked into the session directory only when the uploader's
+# file id changes. A file that cannot be decoded raises InvalidImage, and
+# is remembered, so later reruns report it again without re-reading it.
+
+def _file_id(uploaded_file):
+    # UploadedFile.file_id is unique per upload; fall back to name + size
+    file_id = getattr(uploaded_file, "file_id", None)
+    return file_id or f"{uploaded_file.name}:{uploaded_file.size}"
+
+
+def sweep_stale_sessions(root=None, ttl_hours=None):
+    # Remove directories left behind by sessions that never cleaned up.
+    root = root or config.UPLOAD_DIR
+    ttl = (ttl_hours or config.UPLOAD_SESSION_TTL_HOURS) * 3600
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - ttl
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class SessionUploadStore:
+    def __init__(self, root=None):
+        root = root or config.UPLOAD_DIR
+        sweep_stale_sessions(root)
+        self.session_id = uuid.uuid4().hex
+        self.dir = os.path.join(root, self.session_id)
+        self._entries = {}
+        self._rejected = {}
+        # runs on clear() or when Streamlit drops the session state
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.dir, True)
+
+    def put(self, slot, uploaded_file):
+        file_id = _file_id(uploaded_file)
+        entry = self._entries.get(slot)
+        if entry and entry["file_id"] == file_id and os.path.exists(entry["path"]):
+            metrics.count("upload.reused")
+            return entry
+        rejected = self._rejected.get(slot)
+        if rejected and rejected[0] == file_id:
+            raise InvalidImage(rejected[1])
+        try:
+            with metrics.timer("upload.persist", slot=slot):
+                return self._persist(slot, file_id, uploaded_file)
+        except InvalidImage as e:
+            self.discard(slot)
+            message = f"{uploaded_file.name} could not be read as an image. Please upload a JPEG or PNG photo."
+            self._rejected[slot] = (file_id, message)
+            raise InvalidImage(message) from e
+
+    def _persist(self, slot, file_id, uploaded_file):
+        result = ingest_image(uploaded_file.getvalue())
+        self.discard(slot)
+        os.makedirs(self.dir, exist_ok=True)
+        # link the cached file into the session directory so pruning the
+        # shared cache never removes an image this session still uses
+        path = os.path.join(self.dir, os.path.basename(result["path"]))
+        if not os.path.exists(path):
+            try:
+                os.link(result["path"], path)
+            except OSError:
+                shutil.copyfile(result["path"], path)
+        entry = dict(result, file_id=file_id, path=path)
+        self._entries[slot] = entry
+        return entry
+
+    def discard(self, slot):
+        self._rejected.pop(slot, None)
+        entry = self._entries.pop(slot, None)
+        if entry and not any(e["path"] == entry["path"] for e in self._entries.values()):
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+
+    def entries(self):
+        return list(self._entries.values())
+
+    def clear(self):
+        self._entries.clear()
+        self._rejected.clear()
+        self._finalizer()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.dir, True)
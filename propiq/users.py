@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+
+from propiq import config, metrics
+
+
+# --- USER STORE BACKENDS ---
+class UserStore:
+    """Minimal interface used by register_user/login_user."""
+
+    def get_password(self, username):
+        raise NotImplementedError
+
+    def add_user(self, username, password):
+        """Insert a single user; returns False if the username is taken."""
+        raise NotImplementedError
+
+    def import_users(self, users):
+        """Bulk insert a {username: password} dict, skipping existing names."""
+        return sum(1 for u, p in users.items() if self.add_user(u, p))
+
+    def count(self):
+        raise NotImplementedError
+
+
+class SQLiteUserStore(UserStore):
+    # One connection per thread: Streamlit runs every session in its own
+    # script thread, and WAL lets readers proceed while a writer commits.
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "username TEXT PRIMARY KEY, password TEXT NOT NULL) WITHOUT ROWID"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_password(self, username):
+        row = self._conn().execute(
+            "SELECT password FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_user(self, username, password):
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def import_users(self, users):
+        conn = self._conn()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                users.items(),
+            )
+            return conn.total_changes - before
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+class JSONUserStore(UserStore):
+    # The original whole-file users.json behaviour, kept for small installs.
+    # Writes are serialised inside this process only.
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _save(self, users):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(users, f, indent=4)
+        os.replace(tmp, self.path)
+
+    def get_password(self, username):
+        return self._load().get(username)
+
+    def add_user(self, username, password):
+        with self._lock:
+            users = self._load()
+            if username in users:
+                return False
+            users[username] = password
+            self._save(users)
+        return True
+
+    def import_users(self, users):
+        with self._lock:
+            current = self._load()
+            new = {u: p for u, p in users.items() if u not in current}
+            current.update(new)
+            self._save(current)
+        return len(new)
+
+    def count(self):
+        return len(self._load())
+
+
+BACKENDS = {
+    "sqlite": lambda: SQLiteUserStore(config.USERS_DB),
+    "json": lambda: JSONUserStore(config.USERS_FILE),
+}
+
+
+# --- MIGRATION ---
+def migrate_json_users(store, json_path):
+    # One-shot: import users.json into the store and rename it so the
+    # migration never runs twice.
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, "r") as f:
+        users = json.load(f)
+    imported = store.import_users(users)
+    os.replace(json_path, json_path + ".migrated")
+    return imported
+
+
+# --- PROCESS-WIDE STORE ---
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_user_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if config.USER_STORE not in BACKENDS:
+                    raise ValueError(f"Unknown user store backend: {config.USER_STORE}")
+                store = BACKENDS[config.USER_STORE]()
+                if not isinstance(store, JSONUserStore):
+                    migrate_json_users(store, config.USERS_FILE)
+                _store = store
+    return _store
+
+
+# --- HELPER FUNCTIONS ---
+def register_user(username, password, store=None):
+    store = store or get_user_store()
+    with metrics.timer("users.register"):
+        added = store.add_user(username, password)
+    if not added:
+        return False, "Username already exists!"
+    return True, "User registered successfully!"
+
+
+def login_user(username, password, store=None):
+    store = store or get_user_store()
+    with metrics.timer("users.login"):
+        stored = store.get_password(username)
+    if stored is None:
+        return False, "Username does not exist!"
+    if stored != password:
+        return False, "Incorrect password!"
+    return True, "Logged in successfully!"
@@ -0,0 +1,91 @@
+import numpy as np
+
+# --- VALUATION CALCULATOR ---
+# The three approaches named in TEMPLATE "09.0". Every argument may be a
+# scalar or a NumPy array; results broadcast, so one call values a whole
+# batch of properties or a full sensitivity grid.
+
+
+def market_approach(prices, extents, adjustments, subject_extent, weights=None):
+    # Adjusted comparables. prices/extents/adjustments have the comparables on
+    # the last axis; adjustments are fractions (0.05 = +5%). The subject is
+    # valued at the (weighted) mean adjusted rate per perch.
+    prices, extents, adjustments = (np.asarray(a, dtype=float) for a in (prices, extents, adjustments))
+    rates = prices / extents * (1 + adjustments)
+    rate = np.average(rates, axis=-1, weights=weights)
+    return rate * np.asarray(subject_extent, dtype=float)
+
+
+def rate_approach(rate, subject_extent, adjustment=0.0):
+    # A single adjusted rate per perch applied to the subject; used for the
+    # "adjustment % x rate" sensitivity grid of the market approach.
+    return np.asarray(rate, dtype=float) * (1 + np.asarray(adjustment, dtype=float)) * subject_extent
+
+
+def income_approach(annual_rent, yield_rate, voids=0.0, outgoings=0.0):
+    # Capitalised net rental income; yield_rate, voids and outgoings are fractions.
+    net_income = np.asarray(annual_rent, dtype=float) * (1 - np.asarray(voids)) * (1 - np.asarray(outgoings))
+    return net_income / np.asarray(yield_rate, dtype=float)
+
+
+def cost_approach(land_extent, land_rate, floor_area, build_rate, age, life):
+    # Depreciated replacement cost: land value plus the straight-line
+    # depreciated cost of rebuilding.
+    depreciation = np.clip(np.asarray(age, dtype=float) / np.asarray(life, dtype=float), 0, 1)
+    land = np.asarray(land_extent, dtype=float) * land_rate
+    building = np.asarray(floor_area, dtype=float) * build_rate * (1 - depreciation)
+    return land + building
+
+
+def sensitivity_grid(fn, x_name, x_values, y_name, y_values, **inputs):
+    # fn evaluated over every (x, y) pair in one broadcast call; rows follow
+    # x_values and columns y_values.
+    x = np.asarray(x_values, dtype=float)[:, np.newaxis]
+    y = np.asarray(y_values, dtype=float)[np.newaxis, :]
+    return np.broadcast_to(fn(**{**inputs, x_name: x, y_name: y}), (x.shape[0], y.shape[1]))
+
+
+def around(value, spread, steps):
+    # `steps` evenly spaced values from value*(1-spread) to value*(1+spread)
+    return np.linspace(value * (1 - spread), value * (1 + spread), steps)
+
+
+# --- REASONING TABLES ---
+# [label, value] rows printed under 09.0 in the report.
+
+def _lkr(value):
+    return f"LKR {float(value):,.0f}"
+
+
+def market_reasoning(prices, extents, adjustments, subject_extent):
+    rows = []
+    for n, (price, extent, adj) in enumerate(zip(prices, extents, adjustments), start=1):
+        rows.append([f"Comparable {n}: {_lkr(price)} / {extent:g} P, adj. {adj * 100:+.1f}%",
+                     f"{_lkr(price / extent * (1 + adj))} per perch"])
+    value = market_approach(prices, extents, adjustments, subject_extent)
+    rows.append([f"Mean adjusted rate x {subject_extent:g} perches", _lkr(value)])
+    return rows, float(value)
+
+
+def income_reasoning(annual_rent, yield_rate, voids=0.0, outgoings=0.0):
+    net = annual_rent * (1 - voids) * (1 - outgoings)
+    value = income_approach(annual_rent, yield_rate, voids, outgoings)
+    rows = [
+        ["Gross annual rent", _lkr(annual_rent)],
+        [f"Less voids {voids * 100:.1f}% and outgoings {outgoings * 100:.1f}%", _lkr(net)],
+        [f"Capitalised at {yield_rate * 100:.2f}% (YP {1 / yield_rate:.2f})", _lkr(value)],
+    ]
+    return rows, float(value)
+
+
+def cost_reasoning(land_extent, land_rate, floor_area, build_rate, age, life):
+    depreciation = min(max(age / life, 0), 1)
+    value = cost_approach(land_extent, land_rate, floor_area, build_rate, age, life)
+    rows = [
+        [f"Land: {land_extent:g} perches @ {_lkr(land_rate)}", _lkr(land_extent * land_rate)],
+        [f"Replacement cost: {floor_area:g} sq.ft @ {_lkr(build_rate)}", _lkr(floor_area * build_rate)],
+        [f"Less depreciation {depreciation * 100:.0f}% ({age:g} of {life:g} years)",
+         _lkr(floor_area * build_rate * (1 - depreciation))],
+        ["Depreciated replacement cost", _lkr(value)],
+    ]
+    return rows, float(value)
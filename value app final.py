@@ -1,42 +1,30 @@
+import logging
+import time
+from functools import partial
+
+import numpy as np
 import streamlit as st
-import json
-import os
-from fpdf import FPDF
-from datetime import datetime
-import base64
+
+from propiq import config, metrics
+from propiq.archive import ReportArchive
+from propiq.assets import get_logo, read_text_asset
+from propiq.comparables import ComparablesStore, evidence_rows
+from propiq.drafts import DraftRecorder, DraftStore
+from propiq.images import InvalidImage, summarize
+from propiq.jobs import JobQueue, QueueFull
+from propiq.preview import render_preview_html, thumbnail
+from propiq.uploads import SessionUploadStore
+from propiq import valuation
+from propiq.users import register_user, login_user
+
+logger = logging.getLogger("propiq")
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="PROPIQ | Valuation Report", page_icon="📄", layout="wide")
 
-# --- USERS JSON FILE ---
-USERS_FILE = "users.json"
-
-# --- HELPER FUNCTIONS ---
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
-
-def save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-
-def register_user(username, password):
-    users = load_users()
-    if username in users:
-        return False, "Username already exists!"
-    users[username] = password
-    save_users(users)
-    return True, "User registered successfully!"
-
-def login_user(username, password):
-    users = load_users()
-    if username not in users:
-        return False, "Username does not exist!"
-    if users[username] != password:
-        return False, "Incorrect password!"
-    return True, "Logged in successfully!"
+# whole-script timing (PROPIQ_METRICS=1); runs cut short by st.rerun() are not counted
+rerun_timer = metrics.timer("rerun").start()
+metrics.serve()
 
 # --- SESSION STATE ---
 if "page" not in st.session_state:
@@ -45,51 +33,217 @@ if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 if "username" not in st.session_state:
     st.session_state.username = ""
+if "uploads" not in st.session_state:
+    st.session_state.uploads = SessionUploadStore()
+
+# --- CACHED RESOURCES ---
+# Shared by every session and rerun; the report engine (and fpdf with it) is
+# only loaded the first time somebody generates a report.
+@st.cache_resource
+def load_css():
+    return "<style>\n" + read_text_asset("style.css") + "</style>\n"
+
+
+@st.cache_resource
+def report_engine():
+    from propiq import report
+    report.load_resources()
+    return report
+
+
+@st.cache_resource
+def report_jobs():
+    return JobQueue()
+
+
+@st.cache_resource
+def report_archive():
+    return ReportArchive()
+
+
+@st.cache_resource
+def draft_store():
+    store = DraftStore()
+    store.prune()
+    return store
+
+
+@st.cache_resource
+def comparables_store():
+    return ComparablesStore()
+
+
+@st.cache_data(ttl=600)
+def comparable_types():
+    return comparables_store().property_types()
+
+
+# --- DRAFTS ---
+# Session keys autosaved per user: the form widgets plus the calculator and
+# comparables tables.
+DRAFT_KEYS = (
+    "valuer", "client", "purpose", "property_id", "basis", "valuation_date", "nature", "site_profile",
+    "market_evidence", "assumptions", "approach_text", "valuation_amount", "report_date", "valuation_calc",
+    "part_living_room", "part_bedroom", "part_dining_room", "part_open_veranda", "part_other", "other_part",
+    "comparable_evidence",
+)
+
+
+def open_draft(draft_id=None):
+    # Saves what is pending, then loads draft_id (or a blank form) into the
+    # widget keys. Runs as an on_click callback or before the form widgets
+    # exist, so the widgets pick the values up on this run.
+    current = st.session_state.get("draft")
+    if current:
+        current.flush()
+    values = draft_store().load(draft_id) if draft_id else {}
+    for key in DRAFT_KEYS:
+        if values.get(key) is not None:
+            st.session_state[key] = values[key]
+        else:
+            st.session_state.pop(key, None)
+    st.session_state.draft = DraftRecorder(draft_store(), st.session_state.username, draft_id, values, title_field="property_id")
+
+
+@st.fragment(run_every=config.DRAFT_DEBOUNCE_SECONDS)
+def autosave_draft():
+    # Only mounted while edits are pending: writes the trailing edit of a
+    # burst once the debounce interval is over, then reruns the page so the
+    # timer goes away and the "saved" caption updates.
+    draft = st.session_state.get("draft")
+    if (draft and draft.flush(force=False)) or not (draft and draft.pending):
+        st.rerun()
+
+
+def use_valuation(amount, rows):
+    # on_click callback: fills l) and the 09.0 calculation table
+    st.session_state.valuation_amount = f"LKR {amount:,.0f}"
+    st.session_state.valuation_calc = rows
+
+
+@st.fragment
+def valuation_calculator():
+    # Only runs its widgets (the comparables editor is the expensive one) and
+    # the sensitivity grid while they are switched on, and calculator edits
+    # rerun only this fragment.
+    if not st.toggle("Open the calculator"):
+        return
+    approach = st.radio("Approach", ["Market (adjusted comparables)", "Income (capitalised rent)", "Cost (depreciated replacement cost)"], horizontal=True)
+    if approach.startswith("Market"):
+        subject_extent = st.number_input("Subject land extent (perches)", min_value=0.1, value=20.0)
+        # sales without a recorded extent keep an empty extent and are left out below
+        comps = st.data_editor(
+            [{"price": r["price"], "extent": r["land_extent"], "adjustment %": 0.0} for r in st.session_state.get("comparables") or []]
+            or [{"price": 10_000_000.0, "extent": 10.0, "adjustment %": 0.0}],
+            num_rows="dynamic", key="valuation_comps",
+        )
+        comps = [c for c in comps if c.get("price") and c.get("extent")]
+        prices = [float(c["price"]) for c in comps]
+        extents = [float(c["extent"]) for c in comps]
+        adjustments = [float(c.get("adjustment %") or 0) / 100 for c in comps]
+        calc_rows, amount = valuation.market_reasoning(prices, extents, adjustments, subject_extent) if comps else ([], 0.0)
+        grid = (valuation.rate_approach, {"subject_extent": subject_extent},
+                ("adjustment", np.linspace(-0.2, 0.2, 9), "Adjustment", "{:+.0%}"),
+                ("rate", valuation.around(amount / subject_extent, 0.2, 9), "Rate per perch", "{:,.0f}"))
+    elif approach.startswith("Income"):
+        c1, c2 = st.columns(2)
+        monthly_rent = c1.number_input("Monthly rent (LKR)", min_value=0.0, value=150_000.0, step=5_000.0)
+        yield_pct = c2.number_input("Yield %", min_value=0.25, value=6.0, step=0.25)
+        voids_pct = c1.number_input("Voids %", min_value=0.0, max_value=100.0, value=8.0)
+        outgoings_pct = c2.number_input("Outgoings %", min_value=0.0, max_value=100.0, value=15.0)
+        calc_rows, amount = valuation.income_reasoning(monthly_rent * 12, yield_pct / 100, voids_pct / 100, outgoings_pct / 100)
+        grid = (valuation.income_approach, {"voids": voids_pct / 100, "outgoings": outgoings_pct / 100},
+                ("yield_rate", valuation.around(yield_pct / 100, 0.3, 9), "Yield", "{:.2%}"),
+                ("annual_rent", valuation.around(monthly_rent * 12, 0.2, 9), "Annual rent", "{:,.0f}"))
+    else:
+        c1, c2 = st.columns(2)
+        land_extent = c1.number_input("Land extent (perches)", min_value=0.0, value=20.0)
+        land_rate = c2.number_input("Land rate per perch (LKR)", min_value=0.0, value=1_500_000.0, step=50_000.0)
+        floor_area = c1.number_input("Floor area (sq.ft)", min_value=0.0, value=2_000.0)
+        build_rate = c2.number_input("Construction cost per sq.ft (LKR)", min_value=0.0, value=12_000.0, step=500.0)
+        age = c1.number_input("Age of building (years)", min_value=0.0, value=10.0)
+        life = c2.number_input("Economic life (years)", min_value=1.0, value=60.0)
+        calc_rows, amount = valuation.cost_reasoning(land_extent, land_rate, floor_area, build_rate, age, life)
+        grid = (valuation.cost_approach,
+                {"land_extent": land_extent, "land_rate": land_rate, "floor_area": floor_area, "life": life},
+                ("age", np.linspace(0, life, 9), "Age (years)", "{:.0f}"),
+                ("build_rate", valuation.around(build_rate, 0.2, 9), "Cost per sq.ft", "{:,.0f}"))
+
+    st.metric("Indicated value", f"LKR {amount:,.0f}")
+    if st.toggle("Show sensitivity grid"):
+        import pandas as pd
+
+        fn, inputs, (x_name, x_values, x_label, x_fmt), (y_name, y_values, y_label, y_fmt) = grid
+        values = valuation.sensitivity_grid(fn, x_name, x_values, y_name, y_values, **inputs)
+        st.caption(f"Sensitivity (LKR millions): {x_label} down, {y_label} across")
+        st.dataframe(pd.DataFrame(
+            np.round(values / 1e6, 2),
+            index=[x_fmt.format(x) for x in x_values],
+            columns=[y_fmt.format(y) for y in y_values],
+        ))
+    if st.button("✅ Use this valuation", on_click=use_valuation, args=(amount, calc_rows), disabled=not amount):
+        # l) and the 09.0 table are outside this fragment
+        st.rerun()
+
+
+def add_comparables(rows):
+    # on_click callback: adds the picked sales to the 06.0 table (o), once each
+    table = list(st.session_state.get("comparable_evidence") or [])
+    table += [row for row in evidence_rows(rows) if row not in table]
+    st.session_state.comparable_evidence = table
+
+
+def clear_comparables():
+    st.session_state.pop("comparable_evidence", None)
+
+
+def archived_pdf(report_id):
+    # deferred download data: only read when the button is clicked
+    found = report_archive().pdf(report_id)
+    return found[1] if found else b""
+
+
+def build_report(engine, archive, fields, username, progress=None):
+    # Runs on a report worker: render once, archive, hand the bytes back. The
+    # archive is a convenience: if it fails (locked database, full disk) the
+    # report is still offered for download.
+    report_id = engine.new_report_id()
+    pdf_name, pdf_bytes = engine.generate_pdf(fields, dest="S", report_id=report_id, progress=progress)
+    try:
+        archive.put(report_id, username, pdf_name, pdf_bytes, fields)
+    except Exception:
+        logger.exception("could not archive report %s", report_id)
+        metrics.count("archive.error")
+    return pdf_name, pdf_bytes
+
+
+# --- REPORT JOB STATUS ---
+@st.fragment(run_every=1.0)
+def poll_report_job(job_id):
+    # Re-runs only this fragment while the job is in flight, then hands over
+    # to a full rerun that renders the finished report.
+    job = report_jobs().status(job_id)
+    if job and job["state"] in ("queued", "running"):
+        st.progress(job["progress"], text=f"Generating report: {job['stage']}…")
+        st.caption(f"Reports in queue: {report_jobs().depth()}")
+    else:
+        st.rerun()
+
+
+def show_report_job(job_id):
+    job = report_jobs().status(job_id, with_result=True)
+    if job is None:
+        st.info("The generated report has expired. Generate it again to download.")
+    elif job["state"] == "failed":
+        st.error(f"Report generation failed: {job['error']}")
+    else:
+        pdf_name, pdf_bytes = job["result"]
+        st.success("Your report is ready.")
+        st.download_button("⬇️ Download Valuation Report PDF", data=pdf_bytes, file_name=pdf_name, mime="application/pdf")
+
 
 # --- CUSTOM STYLES ---
-st.markdown("""
-<style>
-body {background-color: #f8f8f8; font-family: 'Segoe UI', sans-serif;}
-main .block-container {padding-top: 0rem !important; margin-top: 0rem !important;}
-.header {
-    background: linear-gradient(90deg, #800000, #a52a2a);
-    padding: 25px 20px;
-    border-radius: 15px;
-    text-align: center;
-    box-shadow: 0 3px 15px rgba(0,0,0,0.15);
-}
-.header h1 {color: #FFD700; font-size: 40px; font-weight: 800; margin: 0;}
-.header h4 {color: #fff8dc; font-weight: 500; margin: 5px 0 0;}
-.card {
-    background: linear-gradient(180deg, #fff, #fdfdfd);
-    border-radius: 18px;
-    box-shadow: 0 6px 24px rgba(0,0,0,0.08);
-    padding: 2.5rem;
-    transition: 0.3s ease-in-out;
-}
-.card:hover {transform: translateY(-3px); box-shadow: 0 8px 28px rgba(0,0,0,0.1);}
-.section-title {color: #800000; font-size: 20px; font-weight: 700; margin-bottom: 10px;}
-label {color: #800000; font-weight: 600;}
-.stTextInput input, .stTextArea textarea {
-    background-color: #fff; border: 2px solid #80000033; border-radius: 8px; color: black;
-}
-.stButton > button {
-    background-color: #800000;
-    color: white;
-    border-radius: 10px;
-    font-weight: 600;
-    padding: 0.6rem 1rem;
-    transition: all 0.25s ease;
-}
-.stButton > button:hover {
-    background-color: #DAA520;
-    color: black;
-    transform: scale(1.02);
-}
-hr {border: 1px solid #80000033; margin: 20px 0;}
-.footer {text-align: center; color: #555; font-size: 13px; margin-top: 40px;}
-</style>
-""", unsafe_allow_html=True)
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # --- HEADER ---
 st.markdown("""
@@ -102,17 +256,52 @@ st.markdown("<br>", unsafe_allow_html=True)
 
 # --- SIDEBAR ---
 with st.sidebar:
-    st.image("https://www.sjp.ac.lk/wp-content/uploads/2020/10/usjp-logo-300x300.png", width=120)
+    logo = get_logo()
+    if logo:
+        st.image(logo["bytes"], width=120)
     if st.session_state.logged_in:
         st.markdown(f"**👋 Welcome, {st.session_state.username}**")
         st.divider()
         if st.button("🏠 Home"):
             st.session_state.page = "home"
             st.rerun()
+        # --- REPORT HISTORY ---
+        # Re-downloads come from the archive; nothing is rendered again.
+        with st.expander("🗂️ My recent reports"):
+            history = report_archive().recent(st.session_state.username)
+            if history:
+                chosen = st.selectbox(
+                    "Report", history, label_visibility="collapsed",
+                    format_func=lambda r: f"{r['report_id']} · {r['property'] or 'unnamed property'}",
+                )
+                st.caption(f"Valuation date {chosen['valuation_date'] or '-'} · {chosen['amount'] or 'no amount'}")
+                st.download_button(
+                    "⬇️ Download again", data=partial(archived_pdf, chosen["report_id"]),
+                    file_name=chosen["filename"], mime="application/pdf", on_click="ignore",
+                )
+            else:
+                st.caption("Reports you generate are kept here.")
+        # --- DRAFTS ---
+        with st.expander("📝 Drafts"):
+            current = st.session_state.get("draft")
+            st.button("➕ New draft", on_click=open_draft, use_container_width=True)
+            for d in draft_store().list(st.session_state.username):
+                st.button(
+                    f"{d['title'] or 'Untitled draft'} · {time.strftime('%d %b %H:%M', time.localtime(d['updated_at']))}",
+                    key=f"draft_{d['draft_id']}", on_click=open_draft, args=(d["draft_id"],),
+                    disabled=bool(current and current.draft_id == d["draft_id"]), use_container_width=True,
+                )
         if st.button("🚪 Logout"):
             st.session_state.logged_in = False
             st.session_state.username = ""
             st.session_state.page = "login"
+            st.session_state.uploads.clear()
+            st.session_state.pop("report_job", None)
+            draft = st.session_state.pop("draft", None)
+            if draft:
+                draft.flush()
+            for key in DRAFT_KEYS:
+                st.session_state.pop(key, None)
             st.rerun()
     else:
         st.markdown("Please log in to access the system.")
@@ -168,35 +357,74 @@ if st.session_state.logged_in:
     st.markdown('<div class="card">', unsafe_allow_html=True)
 
     st.markdown('<div class="section-title">Valuation Report Form</div>', unsafe_allow_html=True)
+    if "draft" not in st.session_state:
+        # first run after login (or a reconnect): resume the newest draft
+        latest = draft_store().latest(st.session_state.username)
+        open_draft(latest["draft_id"] if latest else None)
     fields = {}
 
     with st.expander("📋 General Valuation Information", expanded=True):
-        fields["a) Identification and status of the valuer"] = st.text_input("a) Identification and status of the valuer")
-        fields["b) Client details"] = st.text_input("b) Identification of the client and intended users")
-        fields["c) Purpose of the valuation"] = st.text_area("c) Purpose of the valuation")
-        fields["d) Identification of the property"] = st.text_area("d) Identification of the asset(s) or liability(ies) valued")
-        fields["e) Basis of value adopted"] = st.text_input("e) Basis(es) of value adopted")
-        fields["f) Valuation date"] = st.date_input("f) Valuation date")
+        fields["a) Identification and status of the valuer"] = st.text_input("a) Identification and status of the valuer", key="valuer")
+        fields["b) Client details"] = st.text_input("b) Identification of the client and intended users", key="client")
+        fields["c) Purpose of the valuation"] = st.text_area("c) Purpose of the valuation", key="purpose")
+        fields["d) Identification of the property"] = st.text_area("d) Identification of the asset(s) or liability(ies) valued", key="property_id")
+        fields["e) Basis of value adopted"] = st.text_input("e) Basis(es) of value adopted", key="basis")
+        fields["f) Valuation date"] = st.date_input("f) Valuation date", key="valuation_date")
 
     with st.expander("🏗️ Property & Valuation Details"):
-        fields["g) Nature of the property"] = st.text_area("g) Nature of property")
-        fields["h) Site profile"] = st.text_area("h) Site profile (land/building)")
-        fields["i) Market value evidence"] = st.text_area("i) Evidence of market values")
-        fields["j) Assumptions and reservations"] = st.text_area("j) Assumptions and special reservations")
-        fields["k) Valuation approach"] = st.text_area("k) Valuation approach and reasoning")
-        fields["l) Amount of valuation"] = st.text_input("l) Amount of valuation (LKR)")
-        fields["m) Date of report"] = st.date_input("m) Date of the valuation report")
+        fields["g) Nature of the property"] = st.text_area("g) Nature of property", key="nature")
+        fields["h) Site profile"] = st.text_area("h) Site profile (land/building)", key="site_profile")
+        fields["i) Market value evidence"] = st.text_area("i) Evidence of market values", key="market_evidence")
+        fields["j) Assumptions and reservations"] = st.text_area("j) Assumptions and special reservations", key="assumptions")
+        fields["k) Valuation approach"] = st.text_area("k) Valuation approach and reasoning", key="approach_text")
+        fields["l) Amount of valuation"] = st.text_input("l) Amount of valuation (LKR)", key="valuation_amount")
+        fields["m) Date of report"] = st.date_input("m) Date of the valuation report", key="report_date")
+
+    with st.expander("🔎 Comparable Sales Evidence"):
+        if not comparables_store().has_sales():
+            st.info("No comparable sales loaded yet. Import them with `python -m propiq.comparables import sales.csv`.")
+        else:
+            c1, c2, c3 = st.columns(3)
+            cmp_lat = c1.number_input("Latitude", value=6.9271, format="%.6f")
+            cmp_lon = c2.number_input("Longitude", value=79.8612, format="%.6f")
+            cmp_radius = c3.number_input("Radius (km)", min_value=0.1, max_value=50.0, value=2.0)
+            c4, c5, c6 = st.columns(3)
+            cmp_type = c4.selectbox("Property type", ["Any"] + comparable_types())
+            cmp_months = c5.number_input("Sold within (months)", min_value=1, max_value=240, value=24)
+            cmp_limit = c6.number_input("Number of sales", min_value=1, max_value=50, value=10)
+            if st.button("Search comparables"):
+                st.session_state.comparables = comparables_store().nearest(
+                    cmp_lat, cmp_lon, radius_km=cmp_radius, limit=cmp_limit,
+                    property_type=None if cmp_type == "Any" else cmp_type, months=cmp_months,
+                )
+            comparables = st.session_state.get("comparables")
+            if comparables:
+                event = st.dataframe(
+                    comparables, on_select="rerun", selection_mode="multi-row", hide_index=True,
+                    column_order=("sale_date", "location", "property_type", "land_extent", "price", "distance_km"),
+                )
+                selected = [comparables[i] for i in event.selection.rows]
+                st.button("➕ Add selected to the 06.0 evidence table", disabled=not selected,
+                          on_click=add_comparables, args=(selected,))
+            elif comparables is not None:
+                st.info("No sales match these filters.")
+        if st.session_state.get("comparable_evidence"):
+            st.caption(f"{len(st.session_state.comparable_evidence)} sale(s) in the 06.0 evidence table (see the preview).")
+            st.button("🗑️ Clear the evidence table", on_click=clear_comparables)
+
+    with st.expander("🧮 Valuation Calculator"):
+        valuation_calculator()
 
     with st.expander("🏠 Property Details"):
         st.markdown('<div class="section-title">Select Property Parts</div>', unsafe_allow_html=True)
         parts = {
-            "Living Room": st.checkbox("Living Room"),
-            "Bedroom": st.checkbox("Bedroom"),
-            "Dining Room": st.checkbox("Dining Room"),
-            "Open Veranda": st.checkbox("Open Veranda"),
-            "Other": st.checkbox("Other"),
+            "Living Room": st.checkbox("Living Room", key="part_living_room"),
+            "Bedroom": st.checkbox("Bedroom", key="part_bedroom"),
+            "Dining Room": st.checkbox("Dining Room", key="part_dining_room"),
+            "Open Veranda": st.checkbox("Open Veranda", key="part_open_veranda"),
+            "Other": st.checkbox("Other", key="part_other"),
         }
-        other_part = st.text_input("Specify other:", "") if parts["Other"] else None
+        other_part = st.text_input("Specify other:", key="other_part") if parts["Other"] else None
         selected_parts = [p for p, v in parts.items() if v and p != "Other"]
         if other_part:
             selected_parts.append(other_part)
@@ -204,241 +432,90 @@ if st.session_state.logged_in:
 
     with st.expander("🏠 Property Images"):
         property_images = []
+        uploads = st.session_state.uploads
         img = st.file_uploader("Upload main property photo", type=["jpg", "jpeg", "png"], key="main_img")
         if img:
-            path = "cover_property.jpg"
-            with open(path, "wb") as f:
-                f.write(img.getbuffer())
-            property_images.append({"part": "Subject Property", "path": path})
+            # processed once per upload and kept in this session's own directory
+            try:
+                result = uploads.put("main_img", img)
+                property_images.append({"part": "Subject Property", "path": result["path"]})
+            except InvalidImage as e:
+                st.error(str(e))
+        else:
+            uploads.discard("main_img")
 
         if selected_parts:
             for i, part in enumerate(selected_parts, start=1):
                 img2 = st.file_uploader(f"Upload image for {part}", type=["jpg", "jpeg", "png"], key=f"img_{i}")
                 if img2:
-                    path2 = f"property_image_{i}.jpg"
-                    with open(path2, "wb") as f:
-                        f.write(img2.getbuffer())
-                    property_images.append({"part": part, "path": path2})
+                    try:
+                        result = uploads.put(f"img_{i}", img2)
+                        property_images.append({"part": part, "path": result["path"]})
+                    except InvalidImage as e:
+                        st.error(str(e))
+                else:
+                    uploads.discard(f"img_{i}")
             fields["r) Property Images"] = property_images
         else:
             st.info("Select at least one property part first.")
+        if uploads.entries():
+            stats = summarize(uploads.entries())
+            st.caption(
+                f"Images: {stats['original_bytes'] / 1e6:.1f} MB → {stats['bytes'] / 1e6:.1f} MB "
+                f"({stats['saved_pct']:.0f}% smaller), {stats['seconds'] * 1000:.0f} ms, "
+                f"{stats['cache_hits']}/{stats['images']} from cache"
+            )
+
+    if st.session_state.get("valuation_calc"):
+        fields["n) Valuation calculation"] = st.session_state.valuation_calc
+    if st.session_state.get("comparable_evidence"):
+        fields["o) Comparable sales"] = st.session_state.comparable_evidence
+
+    # --- AUTOSAVE ---
+    # only the fields changed since the last save are written
+    draft = st.session_state.draft
+    draft.observe({key: st.session_state.get(key) for key in DRAFT_KEYS})
+    if draft.pending:
+        autosave_draft()
+    if draft.last_saved_at:
+        st.caption(f"Draft saved at {time.strftime('%H:%M:%S', time.localtime(draft.last_saved_at))}")
 
     # Safe progress bar
     progress = int((sum(1 for v in fields.values() if v) / len(fields)) * 100) if len(fields) > 0 else 0
     st.progress(progress)
     st.caption(f"Form Completion: {progress}%")
 
-    # --- PDF CLASS ---
-    class PDF(FPDF):
-        def header(self):
-            self.set_fill_color(128, 0, 0)
-            self.rect(0, 0, 210, 20, 'F')
-            self.set_text_color(255, 215, 0)
-            self.set_font('Arial', 'B', 16)
-            self.cell(0, 10, "PROPIQ | University of Sri Jayewardenepura", ln=True, align='C')
-            self.ln(10)
-
-        def footer(self):
-            self.set_y(-15)
-            self.set_text_color(128, 0, 0)
-            self.set_font('Arial', 'I', 10)
-            self.cell(0, 10, "Generated by PROPIQ | USJP", 0, 0, 'C')
-
-    # --- Helper to print a template paragraph and then the user's input in bold (if provided) ---
-    def add_template_paragraph(pdf, template_text, input_text=None):
-        pdf.set_text_color(0, 0, 0)
-        pdf.set_font("Arial", "", 11)
-        # print the template explanatory text
-        for line in template_text.split("\n"):
-            pdf.multi_cell(0, 6, line.strip())
-        pdf.ln(2)
-        # print the user input as bold (if provided)
-        if input_text:
-            pdf.set_font("Arial", "B", 11)
-            # if the input is a list (e.g., selected parts), join them
-            if isinstance(input_text, list):
-                input_text_str = ", ".join(input_text) if input_text else "N/A"
-            else:
-                input_text_str = str(input_text)
-            pdf.multi_cell(0, 6, input_text_str)
-            pdf.ln(4)
-        else:
-            pdf.set_font("Arial", "I", 10)
-            pdf.multi_cell(0, 6, "N/A")
-            pdf.ln(4)
-        # reset normal font
-        pdf.set_font("Arial", "", 11)
-
-    # --- Template paragraphs (taken / paraphrased from your uploaded template) ---
-    TEMPLATE = {
-        "01.0 PURPOSE OF VALUATION": """The purpose of this valuation is to determine the Market Value of the subject property for the intended purpose as described below.""",
-        "02.0 DATE OF INSPECTION": """I inspected the subject property on the date noted below in the presence of the agent of the applicant. The date of inspection is generally accepted as the date of valuation.""",
-        "03.0 IDENTIFICATION OF PROPERTY": """Explain how you identify the property. Includes boundary demarcation/plan and deed particulars. It is ideal to give reference to the survey plan details including the plan number, name of the land, name of the surveyor and the date of the survey plan. Indicate assessment number and postal address wherever applicable.""",
-        "04.0 NATURE OF PROPERTY": """Explain the use of the property and occupancy: e.g., owner-occupied residential, commercial or industrial property. Whenever the occupant is not the owner of the property, the status of the occupancy and relationship between owner and occupant should be explained.""",
-        "05.0 SITE PROFILE": """06.1 LAND - Explain the geographical features of the land such as shape, terrain, topography, soil condition, elevation, plantation, etc.\n\n06.2 BUILDING - Describe the building. Generally, this explanation should start from the top of the building (Roof) to the bottom (Foundation). All internal and external features including conveniences should be explained. The floor area of different constructions/ different ages have to be declared. It is recommended to add a pictorial view of the different sections/parts of the building with a small description.""",
-        "06.0 EVIDENCE OF MARKET VALUES": """Details of evidence on land values and rentals as well as cost information should be given here. The types of data needed must be collected from reliable sources both private and public and recorded for future use, and the accuracy of data must be verified.""",
-        "07.0 ASSUMPTION AND RESERVATION": """Assumptions and any special assumptions should be clearly stated. The Assumption is made that a specific investigation by the valuer is not required to prove that something is true. Special Assumptions are those things that are not true but have been assumed to be true.""",
-        "08.0 BASIS OF VALUATION": """This explains the meaning of the value figure reported. Examples: Market Value, Forced Sale Value, Insurance Value. The following definitions (derived from IVS) have been used.""",
-        "09.0 VALUATION APPROACH AND REASONING": """Explain the selected valuation approach and reasoning. This may be the Market approach, Income approach, or Cost approach. The valuation techniques used, and any adjustments should be stated.""",
-        "10.0 CERTIFICATE": """Prepared by the valuer. The valuation was done according to the standards. This report is confidential to the client and is not allowed to be used by any other party for any other purpose. The validity period of this report is as stated below.""",
-    }
-
-    # --- PDF GENERATION FUNCTION ---
-    def generate_pdf(data_dict):
-        pdf = PDF()
-        pdf.set_auto_page_break(auto=True, margin=15)
-
-        # --- COVER PAGE (keep as-is) ---
-        pdf.add_page()
-
-
-        # --- University Logo (top center) ---
-        # --- COVER PAGE ---
-        pdf.image("https://www.sjp.ac.lk/wp-content/uploads/2020/10/usjp-logo-300x300.png", x=85, y=25, w=40)
-
-        pdf.ln(60)
-        pdf.set_font("Arial", "B", 20)
-        pdf.set_text_color(128, 0, 0)
-        pdf.cell(0, 15, "VALUATION REPORT", ln=True, align="C")
-        pdf.ln(10)
-
-        amount = data_dict.get("l) Amount of valuation", "LKR. ___________")
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(0, 10, f"{amount}", ln=True, align="C")
-        pdf.set_font("Arial", "I", 12)
-        pdf.cell(0, 10, "The term of currency is Sri Lankan Rupees", ln=True, align="C")
-        pdf.ln(15)
-
-        report_id = datetime.now().strftime("PROPIQ-%Y%m%d-%H%M%S")
-        pdf.set_font("Arial", "", 12)
-        pdf.cell(0, 10, f"Reference Number of the Report: {report_id}", ln=True, align="C")
-        pdf.ln(15)
-
-        # main cover image (if available)
-        if data_dict.get("r) Property Images"):
-            try:
-                if os.path.exists(data_dict["r) Property Images"][0]["path"]):
-                    pdf.image(data_dict["r) Property Images"][0]["path"], x=25, y=None, w=160)
-            except Exception:
-                # if image fails, continue gracefully
-                pass
-
-        # --- Add rest of report pages based on template structure ---
-        pdf.add_page()
-
-        # Helper to write a section heading
-        def write_section_heading(title):
-            pdf.set_text_color(128, 0, 0)
-            pdf.set_font("Arial", "B", 13)
-            pdf.multi_cell(0, 8, title)
-            pdf.ln(2)
-
-
-
-        # 01.0 PURPOSE
-        write_section_heading("01.0 PURPOSE OF VALUATION")
-        add_template_paragraph(pdf, TEMPLATE["01.0 PURPOSE OF VALUATION"], data_dict.get("c) Purpose of the valuation"))
-
-        # 02.0 DATE OF INSPECTION
-        write_section_heading("02.0 DATE OF INSPECTION")
-        date_of_inspection = data_dict.get("f) Valuation date")
-        add_template_paragraph(pdf, TEMPLATE["02.0 DATE OF INSPECTION"], date_of_inspection.strftime("%Y-%m-%d") if date_of_inspection else None)
-
-        # 03.0 IDENTIFICATION OF PROPERTY
-        write_section_heading("03.0 IDENTIFICATION OF PROPERTY")
-        add_template_paragraph(pdf, TEMPLATE["03.0 IDENTIFICATION OF PROPERTY"], data_dict.get("d) Identification of the property"))
-
-        # 04.0 NATURE OF PROPERTY
-        write_section_heading("04.0 NATURE OF PROPERTY")
-        add_template_paragraph(pdf, TEMPLATE["04.0 NATURE OF PROPERTY"], data_dict.get("g) Nature of the property"))
-
-        # 05.0 SITE PROFILE
-        write_section_heading("05.0 SITE PROFILE")
-        # 05.1 LAND
-        add_template_paragraph(pdf, "05.1 LAND\n" + "Explain the geographical features of the land (shape, terrain, topography, soil condition, elevation, plantation, etc.).", data_dict.get("h) Site profile"))
-        # 05.2 BUILDING
-        write_section_heading("05.2 BUILDING")
-        add_template_paragraph(pdf, "Describe the building (roof to foundation), internal/external features and floor area. A pictorial view is recommended below.", None)
-
-        # Insert property images for parts (after heading)
-        if data_dict.get("r) Property Images"):
-            for img_info in data_dict["r) Property Images"]:
-                try:
-                    pdf.set_font("Arial", "I", 11)
-                    pdf.multi_cell(0, 6, f"{img_info['part']}:")
-                    # insert image and keep width consistent
-                    if os.path.exists(img_info["path"]):
-                        pdf.image(img_info["path"], x=25, y=None, w=160)
-                    pdf.ln(4)
-                except Exception:
-                    # ignore individual image errors
-                    pass
-
-        # 06.0 EVIDENCE OF MARKET VALUES
-        write_section_heading("06.0 EVIDENCE OF MARKET VALUES")
-        add_template_paragraph(pdf, TEMPLATE["06.0 EVIDENCE OF MARKET VALUES"], data_dict.get("i) Market value evidence"))
-
-        # 07.0 ASSUMPTION AND RESERVATION
-        write_section_heading("07.0 ASSUMPTION AND RESERVATION")
-        add_template_paragraph(pdf, TEMPLATE["07.0 ASSUMPTION AND RESERVATION"], data_dict.get("j) Assumptions and reservations"))
-
-        # 08.0 BASIS OF VALUATION
-        write_section_heading("08.0 BASIS OF VALUATION")
-        add_template_paragraph(pdf, TEMPLATE["08.0 BASIS OF VALUATION"], data_dict.get("e) Basis of value adopted"))
-
-        # 09.0 VALUATION APPROACH AND REASONING
-        write_section_heading("09.0 VALUATION APPROACH AND REASONING")
-        add_template_paragraph(pdf, TEMPLATE["09.0 VALUATION APPROACH AND REASONING"], data_dict.get("k) Valuation approach"))
-
-        # 10.0 CERTIFICATE
-        write_section_heading("10.0 CERTIFICATE")
-        # We'll include the prepared-by block using the valuer name and report date
-        certificate_paragraph = TEMPLATE["10.0 CERTIFICATE"] + "\n\n" + \
-                                "Yours Sincerely,\n\n" + \
-                                "{valuer_name}\nChartered Valuation Surveyor\n\n" + \
-                                "Date of Report: {date_of_report}\n\nDISCLAIMER:\nThis template is intended as a general framework only..."
-
-        # replace placeholders
-        valuer_name = data_dict.get("a) Identification and status of the valuer", "__________")
-        date_of_report = data_dict.get("m) Date of the valuation report")
-        date_of_report_str = date_of_report.strftime("%Y-%m-%d") if date_of_report else "__________"
-        filled_certificate = certificate_paragraph.format(valuer_name=valuer_name, date_of_report=date_of_report_str)
-        # print certificate paragraph template (explanatory)
-        add_template_paragraph(pdf, filled_certificate, None)
-
-        # Finally generated info and signature
-        pdf.ln(6)
-        pdf.set_text_color(128, 0, 0)
-        pdf.set_font("Arial", "B", 11)
-        pdf.cell(0, 10, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", ln=True, align="R")
-
-        # Output file
-        filename = f"valuation_report_{report_id}.pdf"
-        pdf.output(filename)
-        return filename
+    # --- QUICK PREVIEW ---
+    # HTML straight from the form; the PDF itself is only built on request below.
+    with st.expander("👁️ Preview Report"):
+        with metrics.timer("preview.html"):
+            preview_html = render_preview_html(fields)
+        st.markdown(preview_html, unsafe_allow_html=True)
+        if fields.get("r) Property Images") and st.toggle("Show photos"):
+            cols = st.columns(4)
+            for n, img_info in enumerate(fields["r) Property Images"]):
+                thumb = thumbnail(img_info["path"])
+                if thumb:
+                    cols[n % 4].image(thumb, caption=img_info["part"])
 
     # --- GENERATE PDF BUTTON ---
     if st.button("📄 Generate PDF Report", use_container_width=True):
-        pdf_path = generate_pdf(fields)
-        # show preview and download
-        with open(pdf_path, "rb") as f:
-            base64_pdf = base64.b64encode(f.read()).decode("utf-8")
-        with st.expander("📑 View Generated PDF", expanded=True):
-            st.markdown(f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="700"></iframe>', unsafe_allow_html=True)
-        with open(pdf_path, "rb") as file:
-            st.download_button("⬇️ Download Valuation Report PDF", data=file, file_name=os.path.basename(pdf_path), mime="application/pdf")
-        # cleanup local files (pdf + images)
+        engine = report_engine()
         try:
-            os.remove(pdf_path)
-        except Exception:
-            pass
-        if fields.get("r) Property Images"):
-            for img_info in fields["r) Property Images"]:
-                try:
-                    if os.path.exists(img_info["path"]):
-                        os.remove(img_info["path"])
-                except Exception:
-                    pass
+            # identical inputs reuse the job (and PDF) that is already there
+            st.session_state.report_job = report_jobs().submit(
+                build_report, engine, report_archive(), fields, st.session_state.username,
+                key=(st.session_state.username, engine.fields_digest(fields)),
+            )
+        except QueueFull:
+            st.warning("The report queue is full right now. Please try again in a moment.")
+    job_id = st.session_state.get("report_job")
+    if job_id:
+        job = report_jobs().status(job_id)
+        if job and job["state"] in ("queued", "running"):
+            poll_report_job(job_id)
+        else:
+            show_report_job(job_id)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -449,3 +526,5 @@ st.markdown("""
 © 2025 PROPIQ | Developed at the University of Sri Jayewardenepura
 </div>
 """, unsafe_allow_html=True)
+
+rerun_timer.stop()